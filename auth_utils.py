@@ -1,42 +1,134 @@
-from passlib.context import CryptContext
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
-from typing import Optional
-import os
-from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Tuple
+import asyncio
+import hashlib
+import secrets
+import time
+from cache import TTLCache
+from metrics import observe_phase
+from settings import settings
 
-load_dotenv()
-
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
+SECRET_KEY = settings.secret_key
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
+REFRESH_TOKEN_EXPIRE_DAYS = settings.refresh_token_expire_days
+
+TOKEN_CACHE_SIZE = settings.token_cache_size
+
+BCRYPT_ROUNDS = settings.bcrypt_rounds
+PASSWORD_HASH_WORKERS = settings.password_hash_workers
+PASSWORD_HASH_MAX_PENDING = settings.password_hash_max_pending
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    # passlib и bcrypt импортируются при первой работе с паролем, а не при старте воркера
+    from passlib.context import CryptContext
+
+    # min/max_rounds совпадают с целевой стоимостью: хеши с другой стоимостью считаются устаревшими
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+        bcrypt__max_rounds=BCRYPT_ROUNDS,
+    )
+
+# bcrypt отпускает GIL, поэтому потоков достаточно, чтобы не блокировать event loop
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_pending_hash_jobs = 0
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Уже проверенные токены: повторная проверка подписи до истечения exp не нужна
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+async def run_password_job(func, *args):
+    global _pending_hash_jobs
+    if _pending_hash_jobs >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервер перегружен, повторите попытку позже",
+            headers={"Retry-After": "1"},
+        )
+
+    _pending_hash_jobs += 1
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_hash_executor, func, *args)
+    finally:
+        _pending_hash_jobs -= 1
+        # Включает ожидание свободного потока: именно столько запрос тратит на bcrypt
+        observe_phase("bcrypt", time.perf_counter() - started)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_job(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    # Возвращает новый хеш, если сохранённый создан с другой стоимостью bcrypt
+    return await run_password_job(get_pwd_context().verify_and_update, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await run_password_job(get_password_hash, password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    # data должен содержать sub и role: по ним авторизуются запросы без чтения пользователя из БД
+    now = datetime.now(timezone.utc)
+    to_encode = {
+        **data,
+        "type": "access",
+        "iat": now,
+        "exp": now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)),
+    }
+    # PyJWT подгружает cryptography, поэтому импортируется при первом токене
+    import jwt
+
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
 def decode_access_token(token: str) -> Optional[dict]:
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    payload = token_cache.get(token)
+    if payload is not None:
         return payload
-    except JWTError:
+
+    import jwt
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+    except jwt.InvalidTokenError:
+        return None
+    if payload.get("type", "access") != "access":
         return None
 
+    token_cache.set(token, payload, ttl=payload["exp"] - time.time())
+    return payload
+
+
+def create_refresh_token() -> Tuple[str, str]:
+    # Клиенту отдаётся случайная строка, в БД хранится только её хеш
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token)
+
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
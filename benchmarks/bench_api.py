@@ -0,0 +1,347 @@
+"""Нагрузочный прогон API на заполненной базе: пропускная способность, p50/p95/p99 и SQL-запросы на запрос.
+
+Запуск:
+    python -m benchmarks.bench_api --users 100 --tasks-per-user 100
+    python -m benchmarks.bench_api --database-url postgresql+asyncpg://... --users 10000 --tasks-per-user 100
+    python -m benchmarks.bench_api --mode uvicorn --skip-seed
+    python -m benchmarks.bench_api --mode http --base-url http://127.0.0.1:8000 --skip-seed
+
+Режимы: asgi — приложение в том же процессе через httpx.ASGITransport; uvicorn — отдельный процесс
+uvicorn на --port; http — уже запущенный сервер (для подсчёта SQL он должен работать
+с METRICS_SERVER_TIMING=true). Результат — JSON в stdout и, при --output, в файл.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import timedelta
+from typing import Callable, List, Optional
+
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///./bench.db"
+API_PREFIX = "/api/v3"
+PASSWORD = "bench-password"
+SEED_CHUNK_SIZE = 5000
+WORDS = [
+    "отчёт", "встреча", "релиз", "бюджет", "договор", "презентация", "ревью", "миграция",
+    "клиент", "счёт", "план", "поддержка", "тестирование", "дизайн", "найм", "аудит",
+]
+SCENARIOS = ["login", "tasks", "quadrant", "search", "stats", "admin_users", "create", "complete"]
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def user_email(index: int) -> str:
+    return f"bench{index}@example.com"
+
+
+async def seed(users: int, tasks_per_user: int, rng: random.Random) -> None:
+    from sqlalchemy import insert
+    from auth_utils import get_password_hash
+    from classification import classify_batch, utc_now
+    from database import drop_db, get_engine, init_db
+    from models import Task, User
+
+    await drop_db()
+    await init_db()
+
+    # Один хеш на всех: bcrypt на каждого пользователя занял бы минуты
+    hashed_password = get_password_hash(PASSWORD)
+    now = utc_now()
+    engine = get_engine()
+
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [{
+            "nickname": "benchadmin", "email": "benchadmin@example.com",
+            "hashed_password": hashed_password, "role": "admin",
+        }])
+        for start in range(0, users, SEED_CHUNK_SIZE):
+            await conn.execute(insert(User), [
+                {
+                    "nickname": f"bench{i}", "email": user_email(i),
+                    "hashed_password": hashed_password, "role": "user",
+                }
+                for i in range(start, min(start + SEED_CHUNK_SIZE, users))
+            ])
+
+    # id пользователей идут подряд после администратора
+    total = users * tasks_per_user
+    for start in range(0, total, SEED_CHUNK_SIZE):
+        rows = []
+        for n in range(start, min(start + SEED_CHUNK_SIZE, total)):
+            deadline = now + timedelta(seconds=rng.randint(-10 * 86400, 30 * 86400)) if rng.random() > 0.1 else None
+            completed = rng.random() > 0.7
+            rows.append({
+                "title": " ".join(rng.sample(WORDS, 3)),
+                "description": " ".join(rng.sample(WORDS, rng.randint(0, 6))) or None,
+                "is_important": rng.random() > 0.5,
+                "completed": completed,
+                "completed_at": now if completed else None,
+                "created_at": now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+                "deadline_at": deadline,
+                "user_id": 2 + n // tasks_per_user,
+            })
+        classifications = classify_batch([(row["is_important"], row["deadline_at"]) for row in rows], now)
+        for row, classification in zip(rows, classifications):
+            row["quadrant"] = classification.quadrant
+        async with engine.begin() as conn:
+            await conn.execute(insert(Task), rows)
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], statements: List[int], errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None  # noqa: E731
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": ms(sum(ordered) / len(ordered)) if ordered else None,
+            "p50": ms(percentile(ordered, 0.50)),
+            "p95": ms(percentile(ordered, 0.95)),
+            "p99": ms(percentile(ordered, 0.99)),
+            "max": ms(ordered[-1]) if ordered else None,
+        },
+        "sql_per_request": {
+            "mean": round(sum(statements) / len(statements), 2) if statements else None,
+            "max": max(statements) if statements else None,
+        },
+    }
+
+
+async def run_scenario(send: Callable, make_request: Callable, count: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    statements: List[int] = []
+    errors = 0
+    remaining = iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for n in remaining:
+            method, url, kwargs = make_request(n)
+            started = time.perf_counter()
+            response = await send(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+            match = SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+            if match:
+                statements.append(int(match.group(1)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statements, errors, time.perf_counter() - started)
+
+
+async def login(client, email: str) -> dict:
+    response = await client.post(f"{API_PREFIX}/auth/login", data={"username": email, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_benchmarks(client, args, rng: random.Random) -> dict:
+    sample = rng.sample(range(args.users), min(args.token_users, args.users))
+    user_headers = [await login(client, user_email(i)) for i in sample]
+    admin_headers = await login(client, "benchadmin@example.com")
+    created: List[tuple] = []
+
+    def pick_user() -> dict:
+        return rng.choice(user_headers)
+
+    def create_request(n):
+        headers = pick_user()
+        return "POST", f"{API_PREFIX}/tasks/", {"headers": headers, "json": {
+            "title": " ".join(rng.sample(WORDS, 3)),
+            "is_important": rng.random() > 0.5,
+            "deadline_at": "2030-01-01T00:00:00Z",
+        }}
+
+    def complete_request(n):
+        headers, task_id = created[n % len(created)]
+        return "PATCH", f"{API_PREFIX}/tasks/{task_id}/complete", {"headers": headers}
+
+    requests = {
+        "login": lambda n: ("POST", f"{API_PREFIX}/auth/login", {"data": {
+            "username": user_email(rng.choice(sample)), "password": PASSWORD,
+        }}),
+        "tasks": lambda n: ("GET", f"{API_PREFIX}/tasks", {"headers": pick_user(), "params": {"limit": 50}}),
+        "quadrant": lambda n: ("GET", f"{API_PREFIX}/tasks/quadrant/{rng.choice(['Q1', 'Q2', 'Q3', 'Q4'])}", {
+            "headers": pick_user(), "params": {"limit": 50},
+        }),
+        "search": lambda n: ("GET", f"{API_PREFIX}/tasks/search", {
+            "headers": pick_user(), "params": {"keyword": rng.choice(WORDS), "limit": 50},
+        }),
+        "stats": lambda n: ("GET", f"{API_PREFIX}/stats/", {"headers": pick_user()}),
+        "admin_users": lambda n: ("GET", f"{API_PREFIX}/admin/users", {"headers": admin_headers, "params": {"limit": 50}}),
+        "create": create_request,
+        "complete": complete_request,
+    }
+
+    async def create_and_remember(method, url, **kwargs):
+        # id созданных задач нужны сценарию complete
+        response = await client.request(method, url, **kwargs)
+        if response.status_code == 201:
+            created.append((kwargs["headers"], response.json()["id"]))
+        return response
+
+    results = {}
+    for name in args.scenarios:
+        if name == "complete" and not created:
+            results[name] = {"skipped": "нет созданных задач: включите сценарий create"}
+            continue
+        count = args.login_requests if name == "login" else args.requests
+        send = create_and_remember if name == "create" else client.request
+        results[name] = await run_scenario(send, requests[name], count, args.concurrency)
+    return results
+
+
+def measure_cold_import() -> Optional[float]:
+    # Отдельный интерпретатор: в текущем процессе модули уже загружены заполнением базы
+    code = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+    try:
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError:
+        return None
+    return round(float(result.stdout.strip().splitlines()[-1]), 4)
+
+
+async def run_asgi(args, rng: random.Random) -> tuple:
+    import httpx
+    from main import app, readiness_state
+
+    started = time.perf_counter()
+    # ASGITransport не запускает lifespan, поэтому проходим его вручную: прогрев пула входит в замер
+    async with app.router.lifespan_context(app):
+        startup = {
+            "time_to_ready_seconds": round(time.perf_counter() - started, 4),
+            "warmed_connections": readiness_state["warmed_connections"],
+        }
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return startup, await run_benchmarks(client, args, rng)
+
+
+async def run_http(args, rng: random.Random, base_url: str, spawned_at: Optional[float] = None) -> tuple:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        for _ in range(300):
+            try:
+                response = await client.get("/ready")
+                if response.status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError(f"Сервер {base_url} не стал готов за 30 секунд")
+
+        # import_seconds и startup_seconds сообщает сам воркер
+        startup = response.json()
+        if spawned_at is not None:
+            startup["time_to_ready_seconds"] = round(time.perf_counter() - spawned_at, 4)
+        return startup, await run_benchmarks(client, args, rng)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tasks-per-user", type=int, default=100)
+    parser.add_argument("--skip-seed", action="store_true", help="Использовать уже заполненную базу")
+    parser.add_argument("--mode", choices=["asgi", "uvicorn", "http"], default="asgi")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="Число воркеров uvicorn в режиме uvicorn")
+    parser.add_argument("--requests", type=int, default=500, help="Запросов на сценарий")
+    parser.add_argument("--login-requests", type=int, default=50, help="Запросов login (упираются в bcrypt)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--token-users", type=int, default=20, help="Сколько пользователей залогинить заранее")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Сохранить JSON-отчёт в файл")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    # Настройки читаются при импорте модулей приложения, поэтому задаём их до импорта
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["METRICS_SERVER_TIMING"] = "true"
+    # Сценарии намеренно превышают лимиты на логин и запросы одного пользователя
+    for name in ("RATE_LIMIT_LOGIN_IP", "RATE_LIMIT_LOGIN_ACCOUNT", "RATE_LIMIT_REGISTER_IP", "RATE_LIMIT_API_USER"):
+        os.environ.setdefault(name, "0")
+    rng = random.Random(args.seed)
+
+    seed_seconds = None
+    if not args.skip_seed:
+        started = time.perf_counter()
+        asyncio.run(seed(args.users, args.tasks_per_user, rng))
+        seed_seconds = round(time.perf_counter() - started, 2)
+
+    server = None
+    try:
+        if args.mode == "asgi":
+            startup, results = asyncio.run(run_asgi(args, rng))
+        elif args.mode == "uvicorn":
+            spawned_at = time.perf_counter()
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+                 "--workers", str(args.workers), "--log-level", "warning"],
+                env=os.environ.copy(),
+            )
+            startup, results = asyncio.run(run_http(args, rng, f"http://127.0.0.1:{args.port}", spawned_at))
+        else:
+            startup, results = asyncio.run(run_http(args, rng, args.base_url))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "mode": args.mode,
+        "database": args.database_url.split("://", 1)[0],
+        "users": args.users,
+        "tasks": args.users * args.tasks_per_user,
+        "concurrency": args.concurrency,
+        "seed_seconds": seed_seconds,
+        "startup": {"cold_import_seconds": measure_cold_import(), **startup},
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Сравнение классификации задач: старые построчные функции и classification.classify_batch.
+
+Запуск: python -m benchmarks.bench_classification [--rows 100000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+import classification  # noqa: E402
+
+URGENCY_THRESHOLD_DAYS = 3
+
+
+def legacy_calculate_urgency(deadline_at):
+    if not deadline_at:
+        return False
+    days_left = (deadline_at.replace(tzinfo=None) - datetime.now()).days
+    return days_left <= URGENCY_THRESHOLD_DAYS
+
+
+def legacy_calculate_quadrant(is_important, is_urgent):
+    if is_important and is_urgent:
+        return "Q1"
+    elif is_important and not is_urgent:
+        return "Q2"
+    elif not is_important and is_urgent:
+        return "Q3"
+    else:
+        return "Q4"
+
+
+def legacy_calculate_days_until_deadline(deadline_at):
+    if not deadline_at:
+        return None
+    return (deadline_at.replace(tzinfo=None) - datetime.now()).days
+
+
+def legacy_classify(rows):
+    # Так считал task_to_response: срочность дважды и отдельный datetime.now() на каждый вызов
+    result = []
+    for is_important, deadline_at in rows:
+        is_urgent = legacy_calculate_urgency(deadline_at)
+        result.append((
+            is_urgent,
+            legacy_calculate_quadrant(is_important, is_urgent),
+            legacy_calculate_days_until_deadline(deadline_at),
+        ))
+    return result
+
+
+def make_rows(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    rows = []
+    for _ in range(count):
+        deadline = None
+        if rng.random() > 0.1:
+            deadline = now + timedelta(seconds=rng.randint(-30 * 86400, 60 * 86400))
+        rows.append((rng.random() > 0.5, deadline))
+    return rows
+
+
+def measure(func, rows, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(rows)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    now = classification.utc_now()
+
+    def scalar(batch):
+        return [classification.classify(flag, deadline, now) for flag, deadline in batch]
+
+    variants = {
+        "legacy_per_row": legacy_classify,
+        "scalar_single_now": scalar,
+        "classify_batch": lambda batch: classification.classify_batch(batch, now),
+    }
+
+    report = {"rows": args.rows, "results": {}}
+    for name, func in variants.items():
+        seconds = measure(func, rows, args.repeat)
+        report["results"][name] = {
+            "best_seconds": round(seconds, 6),
+            "rows_per_second": round(args.rows / seconds) if seconds else None,
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
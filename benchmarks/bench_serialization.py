@@ -0,0 +1,87 @@
+"""Сериализация страницы задач: стандартный путь FastAPI (валидация response_model) и orjson.
+
+Запуск: python -m benchmarks.bench_serialization [--rows 10000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+from pydantic import TypeAdapter  # noqa: E402
+from classification import classify, utc_now  # noqa: E402
+from schemas import TaskPage  # noqa: E402
+from serialization import dumps  # noqa: E402
+
+
+def make_page(count: int, seed: int = 42) -> dict:
+    rng = random.Random(seed)
+    now = utc_now()
+    items = []
+    for task_id in range(1, count + 1):
+        deadline = now + timedelta(seconds=rng.randint(-10 * 86400, 30 * 86400))
+        is_important = rng.random() > 0.5
+        classification = classify(is_important, deadline, now)
+        items.append({
+            "id": task_id,
+            "title": f"Задача {task_id}",
+            "description": "Описание задачи " * rng.randint(0, 5) or None,
+            "is_important": is_important,
+            "is_urgent": classification.is_urgent,
+            "quadrant": classification.quadrant,
+            "completed": rng.random() > 0.7,
+            "created_at": now - timedelta(days=rng.randint(0, 365)),
+            "completed_at": None,
+            "deadline_at": deadline,
+            "days_until_deadline": classification.days_until_deadline,
+        })
+    return {"items": items, "next_cursor": None}
+
+
+def fastapi_default(adapter: TypeAdapter, page: dict) -> bytes:
+    # Повторяет serialize_response + JSONResponse: валидация, dump в JSON-совместимые типы, json.dumps
+    value = adapter.validate_python(page)
+    data = adapter.dump_python(value, mode="json")
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def measure(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    page = make_page(args.rows)
+    adapter = TypeAdapter(TaskPage)
+
+    variants = {
+        "fastapi_validate_and_encode": lambda: fastapi_default(adapter, page),
+        "type_adapter_dump_json": lambda: adapter.dump_json(adapter.validate_python(page)),
+        "orjson_fast_path": lambda: dumps(page),
+    }
+
+    report = {"rows": args.rows, "results": {}}
+    for name, func in variants.items():
+        seconds = measure(func, args.repeat)
+        report["results"][name] = {
+            "best_seconds": round(seconds, 6),
+            "rows_per_second": round(args.rows / seconds) if seconds else None,
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Проверка access-токенов: python-jose (прежняя библиотека), PyJWT и decode_access_token с кэшем.
+
+Запуск: python -m benchmarks.bench_tokens [--iterations 20000] [--tokens 1000] [--repeat 5]
+
+python-jose больше не входит в зависимости; если он установлен, замеряется для сравнения.
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+import jwt  # noqa: E402
+from auth_utils import ALGORITHM, SECRET_KEY, create_access_token, decode_access_token, token_cache  # noqa: E402
+
+
+def make_tokens(count: int) -> list:
+    return [create_access_token({"sub": str(user_id), "role": "user"}) for user_id in range(1, count + 1)]
+
+
+def jose_decode():
+    try:
+        from jose import jwt as jose_jwt
+    except ImportError:
+        return None
+    return lambda token: jose_jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+def pyjwt_decode(token: str) -> dict:
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+
+
+def decode_uncached(token: str) -> dict:
+    # Каждый вызов проходит полную проверку подписи, как первый запрос с новым токеном
+    token_cache.clear()
+    return decode_access_token(token)
+
+
+def measure(func, tokens: list, iterations: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for i in range(iterations):
+            func(tokens[i % len(tokens)])
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--tokens", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+    variants = {
+        "python_jose": jose_decode(),
+        "pyjwt": pyjwt_decode,
+        "decode_access_token_uncached": decode_uncached,
+        "decode_access_token_cached": decode_access_token,
+    }
+
+    report = {"iterations": args.iterations, "distinct_tokens": args.tokens, "results": {}}
+    for name, func in variants.items():
+        if func is None:
+            report["results"][name] = {"skipped": "не установлен"}
+            continue
+        seconds = measure(func, tokens, args.iterations, args.repeat)
+        report["results"][name] = {
+            "best_seconds": round(seconds, 6),
+            "verifications_per_second": round(args.iterations / seconds) if seconds else None,
+        }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
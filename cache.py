@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+from settings import settings
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+class MemoryCacheBackend:
+    def __init__(self, maxsize: int):
+        self._values = TTLCache(maxsize=maxsize, ttl=float("inf"))
+        # Поколения не вытесняются: иначе счётчик обнулится и оживит устаревшие ключи
+        self._counters: dict = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._values.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._values.set(key, value, ttl=ttl)
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+REDIS_URL_SCHEMES = ("redis://", "rediss://", "unix://")
+
+
+def create_redis_client(url: str):
+    try:
+        import redis.asyncio as redis
+    except ImportError as exc:
+        raise RuntimeError(f"Для {url.split('://', 1)[0]}:// установите пакет redis") from exc
+    return redis.from_url(url)
+
+
+class RedisCacheBackend:
+    def __init__(self, url: Optional[str] = None, client=None):
+        self.client = client if client is not None else create_redis_client(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    async def get_counter(self, key: str) -> int:
+        value = await self.client.get(key)
+        return int(value) if value is not None else 0
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+
+def create_cache_backend(url: str):
+    if url.startswith(REDIS_URL_SCHEMES):
+        return RedisCacheBackend(url)
+    return MemoryCacheBackend(maxsize=settings.response_cache_size)
+
+
+def cache_scope(user) -> str:
+    # Администратор видит задачи всех пользователей, поэтому его ответы зависят от любой записи
+    return "all" if user.role == "admin" else f"user:{user.id}"
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._in_flight: "dict[str, asyncio.Future]" = {}
+
+    async def _key(self, namespace: str, scope: str, params: str) -> str:
+        generation = await self.backend.get_counter(f"gen:{scope}")
+        digest = hashlib.blake2b(params.encode(), digest_size=12).hexdigest()
+        return f"resp:{namespace}:{scope}:{generation}:{digest}"
+
+    async def get_or_compute(
+        self, namespace: str, scope: str, params: str, compute: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        if self.ttl <= 0:
+            return await compute()
+
+        key = await self._key(namespace, scope, params)
+        cached = await self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        # Single-flight: параллельные промахи по одному ключу ждут один расчёт
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await compute()
+            await self.backend.set(key, value, self.ttl)
+            future.set_result(value)
+            return value
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Помечаем исключение как полученное, если ожидающих не было
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def invalidate(self, user_ids: Iterable[int]) -> None:
+        for user_id in set(user_ids):
+            await self.backend.incr(f"gen:user:{user_id}")
+        await self.backend.incr("gen:all")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses + self.coalesced
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round((self.hits + self.coalesced) / total, 4) if total else 0.0
+        }
+
+
+response_cache = ResponseCache(create_cache_backend(settings.cache_url), ttl=settings.response_cache_ttl_seconds)
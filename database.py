@@ -1,34 +1,265 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import declarative_base
-from typing import AsyncGenerator
-import os
-from dotenv import load_dotenv
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy import DateTime, func, text
+from typing import AsyncGenerator, List, Optional
+import asyncio
+import itertools
+import time
+from cache import REDIS_URL_SCHEMES, TTLCache, create_redis_client
+from settings import settings
 
-load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+class PoolWaitStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
 
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=True,
-    future=True,
-    pool_pre_ping=True,
-    connect_args={"statement_cache_size": 0}
-)
+    def record(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "total_wait_ms": round(self.total_wait * 1000, 3),
+            "avg_wait_ms": round(self.total_wait * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3)
+        }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_stats.record(time.perf_counter() - started)
+
+
+def engine_options(url: str) -> dict:
+    options = {
+        "echo": settings.db_echo,
+        "future": True,
+        "pool_pre_ping": True,
+    }
+    if url.startswith("sqlite"):
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    if "asyncpg" in url:
+        cache_size = 0 if settings.db_pgbouncer_transaction_mode else settings.db_statement_cache_size
+        options["connect_args"] = {"statement_cache_size": cache_size}
+    return options
+
+
+def make_session_maker(bind) -> async_sessionmaker:
+    return async_sessionmaker(
+        bind,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False,
+        autocommit=False,
+    )
+
+
+# Движки создаются при первом обращении: импорт модуля не тянет драйвер БД и не требует DATABASE_URL
+_engine: Optional[AsyncEngine] = None
+_session_maker: Optional[async_sessionmaker] = None
+_replica_engines: Optional[List[AsyncEngine]] = None
+_replica_session_makers: Optional[List[async_sessionmaker]] = None
+
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        if not settings.database_url:
+            raise RuntimeError("Не задана переменная окружения DATABASE_URL")
+        _engine = create_async_engine(settings.database_url, **engine_options(settings.database_url))
+    return _engine
+
+
+def get_session_maker() -> async_sessionmaker:
+    global _session_maker
+    if _session_maker is None:
+        _session_maker = make_session_maker(get_engine())
+    return _session_maker
+
+
+def get_replica_engines() -> List[AsyncEngine]:
+    global _replica_engines
+    if _replica_engines is None:
+        _replica_engines = [create_async_engine(url, **engine_options(url)) for url in settings.database_replica_urls]
+    return _replica_engines
+
+
+def get_replica_session_makers() -> List[async_sessionmaker]:
+    global _replica_session_makers
+    if _replica_session_makers is None:
+        _replica_session_makers = [make_session_maker(replica) for replica in get_replica_engines()]
+    return _replica_session_makers
 
-async_session_maker = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autoflush=False,
-    autocommit=False,
-)
 
 Base = declarative_base()
 
 
+class sql_now(FunctionElement):
+    # Текущее время на стороне БД с микросекундами во всех СУБД
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+
+@compiles(sql_now)
+def _compile_sql_now(element, compiler, **kw):
+    return compiler.process(func.now(), **kw)
+
+
+@compiles(sql_now, "sqlite")
+def _compile_sql_now_sqlite(element, compiler, **kw):
+    # CURRENT_TIMESTAMP в SQLite даёт 'YYYY-MM-DD HH:MM:SS', а SQLAlchemy пишет и сравнивает даты
+    # в формате '... HH:MM:SS.ffffff'. Строки разного формата сравниваются неверно, и keyset-пагинация
+    # теряет строки внутри одной секунды; %f даёт миллисекунды, дополняем их до микросекунд
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+class MemoryWriteMarks:
+    # Метки только своего процесса: подходит для одного воркера
+    def __init__(self, sticky_seconds: float, maxsize: int = 100_000):
+        self._marks = TTLCache(maxsize=maxsize, ttl=sticky_seconds)
+
+    async def mark(self, user_id: int) -> None:
+        self._marks.set(user_id, True)
+
+    async def is_marked(self, user_id: int) -> bool:
+        return bool(self._marks.get(user_id))
+
+
+class RedisWriteMarks:
+    # Метки видны всем воркерам: запись на одном и следующее чтение на другом попадут в основную БД
+    def __init__(self, sticky_seconds: float, url: Optional[str] = None, client=None):
+        self.client = client if client is not None else create_redis_client(url)
+        self.sticky_ms = max(1, int(sticky_seconds * 1000))
+
+    async def mark(self, user_id: int) -> None:
+        await self.client.set(f"ryw:{user_id}", 1, px=self.sticky_ms)
+
+    async def is_marked(self, user_id: int) -> bool:
+        return bool(await self.client.exists(f"ryw:{user_id}"))
+
+
+def create_write_marks(url: str, sticky_seconds: float):
+    if url.startswith(REDIS_URL_SCHEMES):
+        return RedisWriteMarks(sticky_seconds, url)
+    return MemoryWriteMarks(sticky_seconds)
+
+
+class ReadRouter:
+    def __init__(self, replica_count: int, write_marks):
+        self.replica_count = replica_count
+        self.write_marks = write_marks
+        self._round_robin = itertools.count()
+        self.primary_reads = 0
+        self.sticky_reads = 0
+        self.strong_reads = 0
+        self.replica_reads = [0] * replica_count
+
+    async def mark_write(self, user_id: int) -> None:
+        # Без реплик все чтения и так идут в основную БД, метка не нужна
+        if self.replica_count:
+            await self.write_marks.mark(user_id)
+
+    async def session_maker_for(self, user_id: Optional[int], strong: bool = False) -> async_sessionmaker:
+        if not self.replica_count:
+            self.primary_reads += 1
+            return get_session_maker()
+        if strong:
+            self.strong_reads += 1
+            return get_session_maker()
+        if user_id is not None and await self.write_marks.is_marked(user_id):
+            self.sticky_reads += 1
+            return get_session_maker()
+
+        index = next(self._round_robin) % self.replica_count
+        self.replica_reads[index] += 1
+        return get_replica_session_makers()[index]
+
+    def stats(self) -> dict:
+        return {
+            "replicas": self.replica_count,
+            "write_marks": type(self.write_marks).__name__,
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "strong_reads": self.strong_reads,
+            "replica_reads": list(self.replica_reads)
+        }
+
+
+read_router = ReadRouter(
+    len(settings.database_replica_urls),
+    create_write_marks(settings.read_your_writes_url, settings.read_your_writes_seconds),
+)
+
+
+def engine_pool_status(bind) -> dict:
+    pool = bind.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=settings.db_max_overflow,
+            timeout_seconds=settings.db_pool_timeout,
+        )
+    return status
+
+
+def get_pool_status() -> dict:
+    return {
+        **engine_pool_status(get_engine()),
+        "wait": pool_wait_stats.as_dict(),
+        "replicas": [engine_pool_status(replica) for replica in get_replica_engines()],
+        "routing": read_router.stats()
+    }
+
+
+async def warm_up_pool(bind: AsyncEngine, connections: int) -> int:
+    # Держим все соединения открытыми до конца прогрева, иначе пул вернёт одно и то же
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = await bind.connect()
+            opened.append(conn)
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in opened))
+    finally:
+        for conn in opened:
+            await conn.close()
+    return len(opened)
+
+
+async def warm_up_pools() -> dict:
+    return {
+        "primary": await warm_up_pool(get_engine(), settings.db_pool_warmup),
+        "replicas": [await warm_up_pool(replica, settings.db_pool_warmup) for replica in get_replica_engines()],
+    }
+
+
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
+    async with get_session_maker()() as session:
         try:
             yield session
         finally:
@@ -36,12 +267,13 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
 
 
 async def init_db():
-    async with engine.begin() as conn:
+    # Только для одноразовых баз (бенчмарки); рабочая схема управляется миграциями в migrations/
+    async with get_engine().begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     print("База данных инициализирована!")
 
 
 async def drop_db():
-    async with engine.begin() as conn:
+    async with get_engine().begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
     print("Все таблицы удалены!")
@@ -1,44 +1,98 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from database import get_async_session
+from sqlalchemy import select, event
+from database import get_async_session, read_router
 from models import User
 from models.user import UserRole
 from auth_utils import decode_access_token
-from typing import Optional
+from cache import TTLCache
+from settings import settings
+from typing import AsyncGenerator, NamedTuple, Optional
+import hashlib
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v3/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v3/auth/login", auto_error=False)
 
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_async_session)
-) -> User:
-    credentials_exception = HTTPException(
+USER_CACHE_SIZE = settings.user_cache_size
+USER_CACHE_TTL_SECONDS = settings.user_cache_ttl_seconds
+
+# Ключ — (id пользователя, отпечаток токена); значение — отсоединённый от сессии User
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+
+class Principal(NamedTuple):
+    id: int
+    role: str
+
+
+def token_fingerprint(token: str) -> str:
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+def invalidate_user_cache(user_id: int) -> None:
+    user_cache.discard_where(lambda key: key[0] == user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    invalidate_user_cache(target.id)
+
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось проверить учетные данные",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+async def principal_from_token(request: Request, token: str) -> Principal:
     payload = decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
+    if payload is None or payload.get("sub") is None:
+        raise credentials_exception()
+
+    user_id = int(payload["sub"])
+    if request.method not in SAFE_METHODS:
+        # Следующие чтения этого пользователя пойдут в основную БД (read-your-writes)
+        await read_router.mark_write(user_id)
+    return Principal(user_id, payload.get("role", UserRole.USER.value))
+
 
-    user_id: Optional[int] = payload.get("sub")
-    if user_id is None:
-        raise credentials_exception
+async def get_current_principal(request: Request, token: str = Depends(oauth2_scheme)) -> Principal:
+    # id и роль берутся из короткоживущего access-токена, без запроса пользователя в БД
+    return await principal_from_token(request, token)
 
-    result = await db.execute(select(User).where(User.id == int(user_id)))
+
+async def get_current_user(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_session)
+) -> User:
+    principal = await principal_from_token(request, token)
+    user_id = principal.id
+
+    cache_key = (user_id, token_fingerprint(token))
+    user = user_cache.get(cache_key)
+    if user is not None:
+        return user
+
+    result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
 
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
 
+    # Объект разделяется между запросами, поэтому не держим его в чужой сессии
+    db.expunge(user)
+    user_cache.set(cache_key, user)
     return user
 
 
-async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_admin(current_user: Principal = Depends(get_current_principal)) -> Principal:
     if current_user.role != UserRole.ADMIN.value:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -46,3 +100,20 @@ async def get_current_admin(current_user: User = Depends(get_current_user)) -> U
         )
     return current_user
 
+
+async def get_read_session(
+    request: Request,
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+) -> AsyncGenerator[AsyncSession, None]:
+    user_id = None
+    payload = decode_access_token(token) if token else None
+    if payload is not None and payload.get("sub") is not None:
+        user_id = int(payload["sub"])
+
+    strong = request.headers.get("x-read-consistency", "").lower() == "strong"
+    session_maker = await read_router.session_maker_for(user_id, strong=strong)
+    async with session_maker() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
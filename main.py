@@ -1,19 +1,49 @@
-from fastapi import FastAPI, Depends
-from contextlib import asynccontextmanager
-from database import init_db, get_async_session
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-from routers import tasks, stats, auth, admin
+import time
+
+# Отсчёт до готовности начинается до импорта остальных модулей приложения
+STARTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, Depends  # noqa: E402
+from fastapi.responses import JSONResponse, PlainTextResponse  # noqa: E402
+from contextlib import asynccontextmanager, suppress  # noqa: E402
+import asyncio  # noqa: E402
+from database import get_async_session, get_pool_status, warm_up_pools  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from routers import tasks, stats, auth, admin  # noqa: E402
+from auth_utils import token_cache  # noqa: E402
+from dependencies import user_cache  # noqa: E402
+from cache import response_cache  # noqa: E402
+from reclassifier import run_reclassifier, reclassifier_state  # noqa: E402
+from metrics import MetricsMiddleware, render_metrics  # noqa: E402
+from rate_limit import api_user_limit  # noqa: E402
+
+IMPORT_SECONDS = time.perf_counter() - STARTED_AT
+
+readiness_state = {
+    "ready": False,
+    "import_seconds": round(IMPORT_SECONDS, 4),
+    "startup_seconds": None,
+    "warmed_connections": None,
+}
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Схема создаётся миграциями (alembic upgrade head) до запуска воркеров
     print("Запуск приложения...")
-    print("Инициализация базы данных...")
-    await init_db()
+    readiness_state["warmed_connections"] = await warm_up_pools()
+    reclassifier_task = asyncio.create_task(run_reclassifier())
+    readiness_state["startup_seconds"] = round(time.perf_counter() - STARTED_AT, 4)
+    readiness_state["ready"] = True
     print("Приложение готово к работе!")
     yield
+    # Балансировщик перестаёт слать запросы, пока завершаются текущие
+    readiness_state["ready"] = False
     print("Остановка приложения...")
+    reclassifier_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await reclassifier_task
 
 
 app = FastAPI(
@@ -26,10 +56,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth.router, prefix="/api/v3")
-app.include_router(tasks.router, prefix="/api/v3")
-app.include_router(stats.router, prefix="/api/v3")
-app.include_router(admin.router, prefix="/api/v3")
+app.include_router(tasks.router, prefix="/api/v3", dependencies=[Depends(api_user_limit)])
+app.include_router(stats.router, prefix="/api/v3", dependencies=[Depends(api_user_limit)])
+app.include_router(admin.router, prefix="/api/v3", dependencies=[Depends(api_user_limit)])
 
 
 @app.get("/")
@@ -55,3 +87,40 @@ async def health_check(db: AsyncSession = Depends(get_async_session)) -> dict:
         "status": "healthy",
         "database": db_status
     }
+
+
+@app.get("/ready")
+async def readiness_check():
+    # В отличие от /health не ходит в БД: отвечает, прогрет ли воркер и принимает ли он запросы
+    return JSONResponse(readiness_state, status_code=200 if readiness_state["ready"] else 503)
+
+
+@app.get("/health/pool")
+async def pool_status() -> dict:
+    return get_pool_status()
+
+
+def cache_stats_snapshot() -> dict:
+    return {
+        "users": user_cache.stats(),
+        "tokens": token_cache.stats(),
+        "responses": response_cache.stats()
+    }
+
+
+@app.get("/health/cache")
+async def cache_stats() -> dict:
+    return cache_stats_snapshot()
+
+
+@app.get("/health/reclassifier")
+async def reclassifier_status() -> dict:
+    return reclassifier_state.as_dict()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        render_metrics(get_pool_status(), cache_stats_snapshot()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,242 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from settings import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestMetrics:
+    __slots__ = ("statements", "db", "bcrypt", "serialize")
+
+    def __init__(self):
+        self.statements = 0
+        self.db = 0.0
+        self.bcrypt = 0.0
+        self.serialize = 0.0
+
+
+current_request_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request_metrics", default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            # Счётчики по бакетам, затем сумма и количество наблюдений
+            series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, series in sorted(self._series.items()):
+            pairs = list(zip(self.labels, label_values))
+            labels = format_labels(pairs)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{format_labels(pairs, le=bound)} {cumulative}"
+            yield f"{self.name}_bucket{format_labels(pairs, le='+Inf')} {series[-1]}"
+            yield f"{self.name}_sum{labels} {series[-2]}"
+            yield f"{self.name}_count{labels} {series[-1]}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in sorted(self._values.items()):
+            yield f"{self.name}{format_labels(zip(self.labels, label_values))} {value}"
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(pairs, **extra) -> str:
+    items = [*pairs, *extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in items) + "}"
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Время обработки запроса", LATENCY_BUCKETS, ("method", "route")
+)
+request_statements = Histogram(
+    "http_request_db_statements", "Количество SQL-запросов за HTTP-запрос", STATEMENT_BUCKETS, ("method", "route")
+)
+request_db_time = Histogram(
+    "http_request_db_seconds", "Суммарное время SQL-запросов за HTTP-запрос", LATENCY_BUCKETS, ("method", "route")
+)
+request_serialize_time = Histogram(
+    "http_request_serialization_seconds", "Время сериализации JSON за HTTP-запрос", LATENCY_BUCKETS, ("method", "route")
+)
+requests_total = Counter("http_requests_total", "Количество HTTP-запросов", ("method", "route", "status"))
+bcrypt_duration = Histogram("bcrypt_duration_seconds", "Время хеширования и проверки паролей", LATENCY_BUCKETS)
+db_statements_total = Counter("db_statements_total", "Все SQL-запросы, включая фоновые задачи")
+db_time_total = Counter("db_time_seconds_total", "Суммарное время всех SQL-запросов")
+rate_limited_total = Counter("rate_limited_total", "Запросы, отклонённые лимитером", ("limit",))
+
+
+def observe_phase(phase: str, seconds: float) -> None:
+    if phase == "bcrypt":
+        bcrypt_duration.observe(seconds)
+    metrics = current_request_metrics.get()
+    if metrics is not None:
+        setattr(metrics, phase, getattr(metrics, phase) + seconds)
+
+
+# Слушаем класс Engine, а не конкретный движок: так учитываются и основная БД, и реплики
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+    db_statements_total.inc()
+    db_time_total.inc(amount=elapsed)
+    metrics = current_request_metrics.get()
+    if metrics is not None:
+        metrics.statements += 1
+        metrics.db += elapsed
+
+
+@event.listens_for(Engine, "handle_error")
+def handle_error(exception_context):
+    # after_cursor_execute не вызывается при ошибке, убираем метку начала
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started_at"):
+        conn.info["query_started_at"].pop()
+
+
+def route_label(scope) -> str:
+    # Шаблон маршрута вместо сырого пути, чтобы не плодить серии на каждый id.
+    # Маршрутизатор FastAPI сам кладёт найденный маршрут в scope, повторно сопоставлять не нужно
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+def server_timing(metrics: RequestMetrics, total: float) -> str:
+    return ", ".join([
+        f'db;dur={metrics.db * 1000:.2f};desc="{metrics.statements} queries"',
+        f"bcrypt;dur={metrics.bcrypt * 1000:.2f}",
+        f"serialize;dur={metrics.serialize * 1000:.2f}",
+        f"app;dur={total * 1000:.2f}",
+    ])
+
+
+class MetricsMiddleware:
+    def __init__(self, app, server_timing_enabled: bool = settings.metrics_server_timing):
+        self.app = app
+        self.server_timing_enabled = server_timing_enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = current_request_metrics.set(metrics)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing_enabled:
+                    headers = list(message.get("headers", []))
+                    value = server_timing(metrics, time.perf_counter() - started)
+                    headers.append((b"server-timing", value.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_metrics.reset(token)
+            elapsed = time.perf_counter() - started
+            labels = (scope["method"], route_label(scope))
+            request_duration.observe(elapsed, *labels)
+            request_statements.observe(metrics.statements, *labels)
+            request_db_time.observe(metrics.db, *labels)
+            request_serialize_time.observe(metrics.serialize, *labels)
+            requests_total.inc(*labels, str(status_code))
+
+
+def render_gauges(
+    name: str, help_text: str, samples: Iterable[Tuple[dict, float]], kind: str = "gauge"
+) -> Iterable[str]:
+    yield f"# HELP {name} {help_text}"
+    yield f"# TYPE {name} {kind}"
+    for labels, value in samples:
+        yield f"{name}{format_labels(labels.items())} {value}"
+
+
+def render_metrics(pool_status: dict, caches: Dict[str, dict]) -> str:
+    lines = []
+    for metric in (
+        request_duration, request_statements, request_db_time, request_serialize_time,
+        requests_total, bcrypt_duration, db_statements_total, db_time_total, rate_limited_total,
+    ):
+        lines.extend(metric.render())
+
+    pools = [({"engine": "primary"}, pool_status)]
+    pools += [({"engine": f"replica{i}"}, replica) for i, replica in enumerate(pool_status["replicas"])]
+    for field in ("size", "checked_in", "checked_out", "overflow"):
+        lines.extend(render_gauges(
+            f"db_pool_{field}", f"Пул соединений: {field}",
+            [(labels, status[field]) for labels, status in pools if field in status],
+        ))
+    wait = pool_status["wait"]
+    lines.extend(render_gauges("db_pool_checkouts", "Выдачи соединений из пула", [({}, wait["checkouts"])]))
+    lines.extend(render_gauges(
+        "db_pool_wait_seconds", "Ожидание соединения из пула",
+        [({"stat": "total"}, wait["total_wait_ms"] / 1000), ({"stat": "max"}, wait["max_wait_ms"] / 1000)],
+    ))
+
+    routing = pool_status["routing"]
+    decisions = [
+        ({"target": "primary", "reason": "no_replicas"}, routing["primary_reads"]),
+        ({"target": "primary", "reason": "read_your_writes"}, routing["sticky_reads"]),
+        ({"target": "primary", "reason": "strong"}, routing["strong_reads"]),
+    ]
+    decisions += [
+        ({"target": f"replica{i}", "reason": "round_robin"}, count) for i, count in enumerate(routing["replica_reads"])
+    ]
+    lines.extend(render_gauges("db_read_routing_total", "Куда направлены чтения", decisions, kind="counter"))
+
+    for field in ("hits", "misses", "size"):
+        lines.extend(render_gauges(
+            f"cache_{field}", f"Кэши приложения: {field}",
+            [({"cache": name}, stats[field]) for name, stats in caches.items() if field in stats],
+        ))
+    return "\n".join(lines) + "\n"
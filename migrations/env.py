@@ -0,0 +1,53 @@
+import asyncio
+
+from alembic import context
+from database import Base, get_engine
+from settings import settings
+import models  # noqa: F401  регистрирует таблицы в Base.metadata
+
+target_metadata = Base.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Индексы с ddl_if(dialect=...) существуют только в своей СУБД
+    ddl_if = getattr(object, "_ddl_if", None)
+    if ddl_if is not None and ddl_if.dialect is not None:
+        return ddl_if.dialect == context.get_context().dialect.name
+    return True
+
+
+def configure(**options) -> None:
+    context.configure(
+        target_metadata=target_metadata,
+        include_object=include_object,
+        compare_server_default=True,
+        # SQLite не умеет ALTER COLUMN, поэтому изменения через пересоздание таблицы
+        render_as_batch=settings.database_url.startswith("sqlite"),
+        **options,
+    )
+
+
+def run_migrations_offline() -> None:
+    configure(url=settings.database_url, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection) -> None:
+    configure(connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    # Тот же движок, что и у приложения: одинаковые настройки pgbouncer и statement cache
+    engine = get_engine()
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
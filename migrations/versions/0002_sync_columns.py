@@ -0,0 +1,53 @@
+"""Версии задач для ETag, updated_at и таблица task_tombstones для /tasks/changes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:05:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def recreate_mode() -> str:
+    # SQLite не добавляет NOT NULL-колонку с default now() через ALTER, только пересозданием таблицы
+    return "always" if op.get_bind().dialect.name == "sqlite" else "auto"
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("tasks_version", sa.BigInteger(), server_default="0", nullable=False))
+        batch_op.add_column(sa.Column("tasks_changed_at", sa.DateTime(timezone=True), nullable=True))
+
+    # Существующие задачи получают updated_at = now() через server_default
+    with op.batch_alter_table("tasks", recreate=recreate_mode()) as batch_op:
+        batch_op.add_column(
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False)
+        )
+
+    op.create_table(
+        "task_tombstones",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("task_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_task_tombstones_user_deleted_id", "task_tombstones", ["user_id", "deleted_at", "id"])
+    op.create_index("ix_task_tombstones_deleted_id", "task_tombstones", ["deleted_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_table("task_tombstones")
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.drop_column("updated_at")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("tasks_changed_at")
+        batch_op.drop_column("tasks_version")
@@ -0,0 +1,55 @@
+"""Составные индексы задач под горячие запросы: списки, квадранты, дедлайны, синхронизация и поиск
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:10:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TASK_INDEXES = [
+    ("ix_tasks_user_completed", ["user_id", "completed"]),
+    ("ix_tasks_user_deadline", ["user_id", "deadline_at"]),
+    ("ix_tasks_user_created_id", ["user_id", "created_at", "id"]),
+    ("ix_tasks_user_important_deadline", ["user_id", "is_important", "deadline_at"]),
+    ("ix_tasks_deadline_at", ["deadline_at"]),
+    ("ix_tasks_user_updated_id", ["user_id", "updated_at", "id"]),
+]
+PENDING_ONLY = sa.text("completed = false")
+
+
+def upgrade() -> None:
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+
+    # CONCURRENTLY не блокирует запись в tasks, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, columns in TASK_INDEXES:
+            op.create_index(name, "tasks", columns, postgresql_concurrently=True)
+        op.create_index(
+            "ix_tasks_user_pending_deadline", "tasks", ["user_id", "completed", "deadline_at"],
+            postgresql_where=PENDING_ONLY, sqlite_where=PENDING_ONLY, postgresql_concurrently=True,
+        )
+        if is_postgresql:
+            # Выражение должно совпадать с models.task.task_search_document
+            op.execute(
+                "CREATE INDEX CONCURRENTLY ix_tasks_search_document ON tasks USING gin "
+                "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '')))"
+            )
+
+
+def downgrade() -> None:
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+
+    with op.get_context().autocommit_block():
+        if is_postgresql:
+            op.drop_index("ix_tasks_search_document", table_name="tasks", postgresql_concurrently=True)
+        op.drop_index("ix_tasks_user_pending_deadline", table_name="tasks", postgresql_concurrently=True)
+        for name, _ in reversed(TASK_INDEXES):
+            op.drop_index(name, table_name="tasks", postgresql_concurrently=True)
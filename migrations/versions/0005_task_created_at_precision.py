@@ -0,0 +1,45 @@
+"""created_at задач с микросекундами в SQLite
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:20:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# То же выражение, что database.sql_now() даёт для SQLite
+SQLITE_NOW_MICROSECONDS = "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+def upgrade() -> None:
+    # В PostgreSQL now() уже с микросекундами, меняется только SQLite
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table("tasks", recreate="always") as batch_op:
+        batch_op.alter_column(
+            "created_at",
+            existing_type=sa.DateTime(timezone=True),
+            existing_nullable=False,
+            server_default=sa.text(f"({SQLITE_NOW_MICROSECONDS})"),
+        )
+    # Старые строки 'YYYY-MM-DD HH:MM:SS' приводим к формату, в котором SQLAlchemy передаёт курсор
+    op.execute("UPDATE tasks SET created_at = created_at || '.000000' WHERE length(created_at) = 19")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table("tasks", recreate="always") as batch_op:
+        batch_op.alter_column(
+            "created_at",
+            existing_type=sa.DateTime(timezone=True),
+            existing_nullable=False,
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+        )
@@ -0,0 +1,46 @@
+"""updated_at задач и deleted_at надгробий с микросекундами в SQLite
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 12:25:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# То же выражение, что database.sql_now() даёт для SQLite
+SQLITE_NOW_MICROSECONDS = "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+COLUMNS = (("tasks", "updated_at"), ("task_tombstones", "deleted_at"))
+
+
+def set_sqlite_default(expression: str) -> None:
+    for table, column in COLUMNS:
+        with op.batch_alter_table(table, recreate="always") as batch_op:
+            batch_op.alter_column(
+                column,
+                existing_type=sa.DateTime(timezone=True),
+                existing_nullable=False,
+                server_default=sa.text(f"({expression})"),
+            )
+
+
+def upgrade() -> None:
+    # В PostgreSQL now() уже с микросекундами, меняется только SQLite
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    set_sqlite_default(SQLITE_NOW_MICROSECONDS)
+    # Токен синхронизации сравнивается строкой, поэтому старые значения приводим к формату SQLAlchemy
+    for table, column in COLUMNS:
+        op.execute(f"UPDATE {table} SET {column} = {column} || '.000000' WHERE length({column}) = 19")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    set_sqlite_default("CURRENT_TIMESTAMP")
@@ -0,0 +1,32 @@
+"""Индексы (created_at, id) и (updated_at, id) для списков и синхронизации администратора
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 12:35:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TASK_INDEXES = [
+    ("ix_tasks_created_id", ["created_at", "id"]),
+    ("ix_tasks_updated_id", ["updated_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в tasks, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, columns in TASK_INDEXES:
+            op.create_index(name, "tasks", columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(TASK_INDEXES):
+            op.drop_index(name, table_name="tasks", postgresql_concurrently=True)
@@ -1,5 +1,8 @@
 from database import Base
+from models.job_watermark import JobWatermark
+from models.refresh_token import RefreshToken
 from models.task import Task
+from models.task_tombstone import TaskTombstone
 from models.user import User, UserRole
 
-__all__ = ["Base", "Task", "User", "UserRole"]
+__all__ = ["Base", "JobWatermark", "RefreshToken", "Task", "TaskTombstone", "User", "UserRole"]
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime
+from database import Base
+
+
+class JobWatermark(Base):
+    __tablename__ = "job_watermarks"
+
+    # Граница, до которой фоновая задача уже обработала данные; общая для всех воркеров и перезапусков
+    name = Column(String(64), primary_key=True)
+    watermark = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<JobWatermark(name='{self.name}', watermark='{self.watermark}')>"
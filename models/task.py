@@ -1,7 +1,17 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Index, literal_column
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-from database import Base
+from database import Base, sql_now
+
+SEARCH_CONFIG = "simple"
+
+
+def task_search_document(title, description):
+    # Выражение должно совпадать с индексом ix_tasks_search_document, поэтому без параметров
+    text = func.coalesce(title, literal_column("''")).concat(literal_column("' '")).concat(
+        func.coalesce(description, literal_column("''"))
+    )
+    return func.to_tsvector(literal_column(f"'{SEARCH_CONFIG}'"), text)
 
 
 class Task(Base):
@@ -13,12 +23,38 @@ class Task(Base):
     is_important = Column(Boolean, nullable=False, default=False)
     quadrant = Column(String(2), nullable=False)
     completed = Column(Boolean, nullable=False, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=sql_now(), nullable=False)
     completed_at = Column(DateTime(timezone=True), nullable=True)
     deadline_at = Column(DateTime(timezone=True), nullable=True)
-    
+    updated_at = Column(DateTime(timezone=True), server_default=sql_now(), onupdate=sql_now(), nullable=False)
+
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     owner = relationship("User", back_populates="tasks")
 
+    __table_args__ = (
+        Index("ix_tasks_user_completed", "user_id", "completed"),
+        Index("ix_tasks_user_deadline", "user_id", "deadline_at"),
+        Index("ix_tasks_user_important_deadline", "user_id", "is_important", "deadline_at"),
+        Index("ix_tasks_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_tasks_deadline_at", "deadline_at"),
+        Index("ix_tasks_user_updated_id", "user_id", "updated_at", "id"),
+        # Администратор читает задачи всех пользователей: без условия на user_id нужны ключи без него
+        Index("ix_tasks_created_id", "created_at", "id"),
+        Index("ix_tasks_updated_id", "updated_at", "id"),
+        # Только незавершённые задачи: /tasks/today и /stats/deadlines читают диапазон по дедлайну
+        Index(
+            "ix_tasks_user_pending_deadline", "user_id", "completed", "deadline_at",
+            postgresql_where=completed == False,
+            sqlite_where=completed == False,
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"<Task(id={self.id}, title='{self.title}', quadrant='{self.quadrant}')>"
+
+
+Index(
+    "ix_tasks_search_document",
+    task_search_document(Task.title, Task.description),
+    postgresql_using="gin",
+).ddl_if(dialect="postgresql")
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from database import Base, sql_now
+
+
+class TaskTombstone(Base):
+    __tablename__ = "task_tombstones"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=sql_now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_task_tombstones_user_deleted_id", "user_id", "deleted_at", "id"),
+        Index("ix_task_tombstones_deleted_id", "deleted_at", "id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<TaskTombstone(task_id={self.task_id}, deleted_at='{self.deleted_at}')>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
 from sqlalchemy.orm import relationship
 from database import Base
 import enum
@@ -17,6 +17,9 @@ class User(Base):
     email = Column(String(100), unique=True, nullable=False, index=True)
     hashed_password = Column(String(255), nullable=False)
     role = Column(String(10), nullable=False, default="user")
+    # Растёт при каждом изменении задач пользователя; используется для ETag
+    tasks_version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    tasks_changed_at = Column(DateTime(timezone=True), nullable=True)
 
     tasks = relationship("Task", back_populates="owner", cascade="all, delete-orphan")
 
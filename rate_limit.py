@@ -0,0 +1,149 @@
+import math
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from auth_utils import decode_access_token
+from cache import REDIS_URL_SCHEMES, TTLCache, create_redis_client
+from metrics import rate_limited_total
+from settings import settings
+
+RATE_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+RATE_LIMIT_MEMORY_KEYS = 100_000
+
+
+def parse_rate(rate: Optional[str]) -> Optional[Tuple[int, float]]:
+    # "10/minute" -> (10, 60.0); пустая строка или 0 — лимит отключён
+    if not rate or not rate.strip():
+        return None
+    count, _, period = rate.strip().partition("/")
+    if count == "0" and not period:
+        return None
+    if period not in RATE_PERIODS:
+        raise ValueError(f"Неверный лимит {rate!r}: ожидается N/second|minute|hour|day")
+    if int(count) <= 0:
+        return None
+    return int(count), float(RATE_PERIODS[period])
+
+
+class MemoryRateLimitBackend:
+    def __init__(self, maxsize: int = RATE_LIMIT_MEMORY_KEYS):
+        # Ключ -> (токены, время обновления); TTLCache вытесняет давно не использованные ведра
+        self._buckets = TTLCache(maxsize=maxsize, ttl=float("inf"))
+
+    async def take(self, key: str, capacity: int, period: float) -> float:
+        now = time.monotonic()
+        refill_rate = capacity / period
+        tokens, updated_at = self._buckets.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / refill_rate
+        # Через period ведро гарантированно наполнится, поэтому дольше его хранить незачем
+        self._buckets.set(key, (tokens, now), ttl=period)
+        return retry_after
+
+
+# Атомарная проверка ведра на стороне Redis: одно обращение на запрос, без гонок между воркерами
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local rate = capacity / period
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(period * 1000))
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimitBackend:
+    def __init__(self, url: Optional[str] = None, client=None):
+        self.client = client if client is not None else create_redis_client(url)
+        self._script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str, capacity: int, period: float) -> float:
+        # Время берём у приложения: TIME в скриптах недоступен в части Redis-совместимых серверов
+        retry_after = await self._script(keys=[key], args=[capacity, period, time.time()])
+        return float(retry_after)
+
+
+def create_rate_limit_backend(url: str):
+    if url.startswith(REDIS_URL_SCHEMES):
+        return RedisRateLimitBackend(url)
+    return MemoryRateLimitBackend()
+
+
+rate_limit_backend = create_rate_limit_backend(settings.rate_limit_url)
+
+
+def client_ip(request: Request) -> str:
+    if settings.rate_limit_trust_forwarded:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",", 1)[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def ip_key(request: Request) -> str:
+    return f"ip:{client_ip(request)}"
+
+
+async def user_key(request: Request) -> str:
+    # Токен уже проверен и закэширован decode_access_token, до БД дело не доходит
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    payload = decode_access_token(token) if scheme.lower() == "bearer" and token else None
+    if payload and payload.get("sub"):
+        return f"user:{payload['sub']}"
+    return await ip_key(request)
+
+
+async def login_account_key(request: Request) -> str:
+    # Форма уже разобрана FastAPI до зависимостей, повторного чтения тела нет
+    form = await request.form()
+    return f"account:{str(form.get('username', '')).strip().lower()}"
+
+
+class RateLimit:
+    def __init__(self, name: str, rate: Optional[str], key: Callable[[Request], Awaitable[str]] = ip_key):
+        self.name = name
+        self.limit = parse_rate(rate)
+        self.key = key
+
+    async def __call__(self, request: Request) -> None:
+        if self.limit is None:
+            return
+        capacity, period = self.limit
+
+        route = request.scope.get("route")
+        path = route.path if route is not None else request.url.path
+        bucket = f"rl:{self.name}:{path}:{await self.key(request)}"
+
+        retry_after = await rate_limit_backend.take(bucket, capacity, period)
+        if retry_after > 0:
+            rate_limited_total.inc(self.name)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Слишком много запросов, повторите попытку позже",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+
+login_ip_limit = RateLimit("login_ip", settings.rate_limit_login_ip, ip_key)
+login_account_limit = RateLimit("login_account", settings.rate_limit_login_account, login_account_key)
+register_ip_limit = RateLimit("register_ip", settings.rate_limit_register_ip, ip_key)
+password_user_limit = RateLimit("password_user", settings.rate_limit_password_user, user_key)
+refresh_ip_limit = RateLimit("refresh_ip", settings.rate_limit_refresh_ip, ip_key)
+api_user_limit = RateLimit("api_user", settings.rate_limit_api_user, user_key)
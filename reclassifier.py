@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import func, select, update
+from database import get_session_maker
+from models import JobWatermark, Task
+from classification import as_utc, quadrant_expression, urgency_cutoff, utc_now
+from settings import settings
+
+RECLASSIFY_INTERVAL_SECONDS = settings.reclassify_interval_seconds
+RECLASSIFY_JOB_NAME = "reclassify_quadrants"
+# Ключ pg_try_advisory_xact_lock: один проход на всю базу, сколько бы воркеров ни было запущено
+RECLASSIFY_LOCK_ID = 0x7265636C
+
+
+class ReclassifierState:
+    def __init__(self):
+        self.watermark: Optional[datetime] = None
+        self.runs = 0
+        self.skipped = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration_ms = 0.0
+        self.last_rows_updated = 0
+        self.total_rows_updated = 0
+        self.last_error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "enabled": RECLASSIFY_INTERVAL_SECONDS > 0,
+            "interval_seconds": RECLASSIFY_INTERVAL_SECONDS,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "last_run_at": self.last_run_at,
+            "last_duration_ms": self.last_duration_ms,
+            "last_rows_updated": self.last_rows_updated,
+            "total_rows_updated": self.total_rows_updated,
+            "watermark": self.watermark,
+            "last_error": self.last_error
+        }
+
+
+reclassifier_state = ReclassifierState()
+
+
+async def reclassify_quadrants(now: Optional[datetime] = None, min_interval: float = 0) -> Optional[int]:
+    # Возвращает число обновлённых строк или None, если проход выполнил другой процесс
+    now = now or utc_now()
+    cutoff = urgency_cutoff(now)
+    quadrant = quadrant_expression(Task.is_important, Task.deadline_at, now)
+
+    started = asyncio.get_running_loop().time()
+    async with get_session_maker()() as session:
+        if session.bind.dialect.name == "postgresql":
+            # Блокировка держится до конца транзакции; остальные воркеры этот проход пропускают
+            locked = await session.scalar(select(func.pg_try_advisory_xact_lock(RECLASSIFY_LOCK_ID)))
+            if not locked:
+                reclassifier_state.skipped += 1
+                return None
+
+        job = await session.get(JobWatermark, RECLASSIFY_JOB_NAME)
+        watermark = as_utc(job.watermark) if job is not None else None
+        if watermark is not None and (cutoff - watermark).total_seconds() < min_interval:
+            # Другой воркер только что выполнил проход
+            reclassifier_state.skipped += 1
+            reclassifier_state.watermark = watermark
+            return None
+
+        statement = update(Task).where(Task.quadrant != quadrant).values(quadrant=quadrant)
+        if watermark is not None:
+            # Срочными с прошлого прохода стали только задачи с дедлайном в [старая граница, новая граница).
+            # Полный проход по таблице — только при самом первом запуске, watermark хранится в БД
+            statement = statement.where(Task.deadline_at >= watermark, Task.deadline_at < cutoff)
+        result = await session.execute(statement.execution_options(synchronize_session=False))
+
+        if job is None:
+            session.add(JobWatermark(name=RECLASSIFY_JOB_NAME, watermark=cutoff))
+        else:
+            job.watermark = cutoff
+        await session.commit()
+
+    state = reclassifier_state
+    state.watermark = cutoff
+    state.runs += 1
+    state.last_run_at = now
+    state.last_duration_ms = round((asyncio.get_running_loop().time() - started) * 1000, 3)
+    state.last_rows_updated = result.rowcount
+    state.total_rows_updated += result.rowcount
+    state.last_error = None
+    return result.rowcount
+
+
+async def run_reclassifier(interval: float = RECLASSIFY_INTERVAL_SECONDS) -> None:
+    # 0 или меньше отключает фоновый пересчёт, например когда он запускается по cron: python -m reclassifier
+    if interval <= 0:
+        return
+    while True:
+        try:
+            # Воркеры просыпаются почти одновременно: проход, сделанный другим менее полуинтервала назад, не повторяем
+            await reclassify_quadrants(min_interval=interval / 2)
+        except Exception as exc:
+            # Watermark в БД не сдвинулся, следующий проход повторит то же окно
+            reclassifier_state.last_error = repr(exc)
+            print(f"Ошибка пересчёта квадрантов: {exc!r}")
+        await asyncio.sleep(interval)
+
+
+async def main() -> None:
+    rows = await reclassify_quadrants()
+    print("Проход выполняет другой процесс" if rows is None else f"Обновлено задач: {rows}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,38 +1,89 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from database import get_async_session
+from sqlalchemy import select, func, and_, or_
 from models import User, Task
-from dependencies import get_current_admin
+from dependencies import Principal, get_current_admin, get_read_session
+from pagination import PageParams, encode_cursor, decode_cursor, parse_cursor_int
+from classification import QUADRANTS, quadrant_condition, utc_now
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 
 @router.get("/users")
 async def get_all_users(
-    db: AsyncSession = Depends(get_async_session),
-    current_admin: User = Depends(get_current_admin)
+    page: PageParams = Depends(),
+    sort: str = Query("id", description="Сортировка: id или tasks_count (по убыванию)"),
+    breakdown: bool = Query(False, description="Добавить разбивку задач по квадрантам и статусам"),
+    db: AsyncSession = Depends(get_read_session),
+    current_admin: Principal = Depends(get_current_admin)
 ):
-    result = await db.execute(select(User))
-    users = result.scalars().all()
-    
+    if sort not in ["id", "tasks_count"]:
+        raise HTTPException(status_code=400, detail="Недопустимая сортировка. Используйте: id или tasks_count")
+
+    tasks_count = func.count(Task.id)
+    columns = [User.id, User.nickname, User.email, User.role, tasks_count.label("tasks_count")]
+
+    if breakdown:
+        now = utc_now()
+        columns += [
+            func.count(Task.id).filter(Task.completed == True).label("completed"),
+            func.count(Task.id).filter(Task.completed == False).label("pending"),
+        ]
+        columns += [
+            func.count(Task.id).filter(quadrant_condition(q, now)).label(q)
+            for q in QUADRANTS
+        ]
+
+    query = (
+        select(*columns)
+        .select_from(User)
+        .outerjoin(Task, Task.user_id == User.id)
+        .group_by(User.id)
+    )
+
+    if sort == "tasks_count":
+        if page.cursor:
+            count, user_id = map(parse_cursor_int, decode_cursor(page.cursor, 2))
+            query = query.having(
+                or_(tasks_count < count, and_(tasks_count == count, User.id > user_id))
+            )
+        query = query.order_by(tasks_count.desc(), User.id)
+    else:
+        if page.cursor:
+            (user_id,) = map(parse_cursor_int, decode_cursor(page.cursor, 1))
+            query = query.where(User.id > user_id)
+        query = query.order_by(User.id)
+
+    result = await db.execute(query.limit(page.limit + 1))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        if sort == "tasks_count":
+            next_cursor = encode_cursor(last.tasks_count, last.id)
+        else:
+            next_cursor = encode_cursor(last.id)
+
     users_with_tasks = []
-    for user in users:
-        tasks_result = await db.execute(
-            select(func.count(Task.id)).where(Task.user_id == user.id)
-        )
-        tasks_count = tasks_result.scalar()
-        
-        users_with_tasks.append({
-            "id": user.id,
-            "nickname": user.nickname,
-            "email": user.email,
-            "role": user.role,
-            "tasks_count": tasks_count
-        })
-    
+    for row in rows:
+        user_info = {
+            "id": row.id,
+            "nickname": row.nickname,
+            "email": row.email,
+            "role": row.role,
+            "tasks_count": row.tasks_count
+        }
+        if breakdown:
+            user_info["by_status"] = {"completed": row.completed, "pending": row.pending}
+            user_info["by_quadrant"] = {q: row._mapping[q] for q in QUADRANTS}
+        users_with_tasks.append(user_info)
+
+    total_result = await db.execute(select(func.count(User.id)))
+
     return {
-        "total_users": len(users_with_tasks),
-        "users": users_with_tasks
+        "total_users": total_result.scalar(),
+        "users": users_with_tasks,
+        "next_cursor": next_cursor
     }
-
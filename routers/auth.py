@@ -1,18 +1,77 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import secrets
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from database import get_async_session
-from models import User
+from models import RefreshToken, User
 from models.user import UserRole
-from schemas_auth import UserCreate, UserResponse, Token
-from auth_utils import verify_password, get_password_hash, create_access_token
-from dependencies import get_current_user
+from schemas_auth import RefreshRequest, UserCreate, UserResponse, Token
+from auth_utils import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    verify_password_async,
+    verify_and_update_password_async,
+    get_password_hash_async,
+    create_access_token,
+    create_refresh_token,
+    hash_refresh_token,
+)
+from dependencies import get_current_user, invalidate_user_cache
+from rate_limit import (
+    login_account_limit,
+    login_ip_limit,
+    password_user_limit,
+    refresh_ip_limit,
+    register_ip_limit,
+)
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 
-@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+def invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Недействительный refresh-токен",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def issue_tokens(db: AsyncSession, user_id: int, role: str, family_id: Optional[str] = None) -> dict:
+    # Строка refresh-токена добавляется в сессию; коммит делает вызывающий эндпоинт
+    refresh_token, token_hash = create_refresh_token()
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=token_hash,
+        family_id=family_id or secrets.token_hex(16),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return {
+        "access_token": create_access_token(data={"sub": str(user_id), "role": role}),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": refresh_token,
+    }
+
+
+async def revoke_refresh_tokens(db: AsyncSession, *conditions) -> None:
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.revoked_at.is_(None), *conditions)
+        .values(revoked_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Лимиты в dependencies маршрута выполняются раньше параметров эндпоинта: до запросов в БД и bcrypt
+@router.post(
+    "/register",
+    response_model=UserResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(register_ip_limit)],
+)
 async def register(
     user_data: UserCreate,
     db: AsyncSession = Depends(get_async_session)
@@ -34,7 +93,7 @@ async def register(
     new_user = User(
         nickname=user_data.nickname,
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await get_password_hash_async(user_data.password),
         role=UserRole.USER.value
     )
 
@@ -45,7 +104,7 @@ async def register(
     return new_user
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(login_ip_limit), Depends(login_account_limit)])
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_async_session)
@@ -53,16 +112,80 @@ async def login(
     result = await db.execute(select(User).where(User.email == form_data.username))
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await verify_and_update_password_async(form_data.password, user.hashed_password)
+
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный email или пароль",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token = create_access_token(data={"sub": str(user.id), "role": user.role})
+    if new_hash:
+        user.hashed_password = new_hash
 
-    return {"access_token": access_token, "token_type": "bearer"}
+    tokens = await issue_tokens(db, user.id, user.role)
+    await db.commit()
+    return tokens
+
+
+@router.post("/refresh", response_model=Token, dependencies=[Depends(refresh_ip_limit)])
+async def refresh(
+    data: RefreshRequest,
+    db: AsyncSession = Depends(get_async_session)
+):
+    token_hash = hash_refresh_token(data.refresh_token)
+    now = datetime.now(timezone.utc)
+
+    # Погашение и проверка одним UPDATE: два параллельных запроса с одним токеном не получат две пары
+    result = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(revoked_at=now)
+        .returning(RefreshToken.user_id, RefreshToken.family_id)
+    )
+    row = result.one_or_none()
+
+    if row is None:
+        result = await db.execute(
+            select(RefreshToken.family_id, RefreshToken.revoked_at).where(RefreshToken.token_hash == token_hash)
+        )
+        stale = result.one_or_none()
+        if stale is not None and stale.revoked_at is not None:
+            # Уже погашенный токен предъявлен повторно — вероятна утечка, отзываем всю цепочку
+            await revoke_refresh_tokens(db, RefreshToken.family_id == stale.family_id)
+            await db.commit()
+        raise invalid_refresh_token()
+
+    user_id, family_id = row
+    # Роль читается заново при каждом продлении: её изменение вступает в силу не позже срока access-токена
+    role = await db.scalar(select(User.role).where(User.id == user_id))
+    if role is None:
+        await db.rollback()
+        raise invalid_refresh_token()
+
+    tokens = await issue_tokens(db, user_id, role, family_id)
+    await db.commit()
+    return tokens
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    data: RefreshRequest,
+    db: AsyncSession = Depends(get_async_session)
+):
+    # Access-токен доживает свой короткий срок, новые по этой цепочке уже не выдаются
+    family_id = select(RefreshToken.family_id).where(
+        RefreshToken.token_hash == hash_refresh_token(data.refresh_token)
+    ).scalar_subquery()
+    await revoke_refresh_tokens(db, RefreshToken.family_id == family_id)
+    await db.commit()
 
 
 @router.get("/me", response_model=UserResponse)
@@ -70,14 +193,17 @@ async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 
-@router.patch("/change-password")
+@router.patch("/change-password", dependencies=[Depends(password_user_limit)])
 async def change_password(
     old_password: str,
     new_password: str,
     db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user)
 ):
-    if not verify_password(old_password, current_user.hashed_password):
+    # current_user может быть взят из кэша и не привязан к текущей сессии
+    user = await db.get(User, current_user.id)
+
+    if not await verify_password_async(old_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Неверный текущий пароль"
@@ -89,7 +215,11 @@ async def change_password(
             detail="Новый пароль должен содержать минимум 6 символов"
         )
     
-    current_user.hashed_password = get_password_hash(new_password)
+    user.hashed_password = await get_password_hash_async(new_password)
+    # После смены пароля все сессии пользователя должны войти заново
+    await revoke_refresh_tokens(db, RefreshToken.user_id == user.id)
     await db.commit()
+    # Событие after_update срабатывает до коммита; сбрасываем ещё раз, чтобы не осталось старых данных
+    invalidate_user_cache(user.id)
     
     return {"message": "Пароль успешно изменён"}
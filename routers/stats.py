@@ -1,101 +1,153 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from datetime import datetime
-from models import Task, User
-from database import get_async_session
-from dependencies import get_current_user
+from sqlalchemy import select, func, literal_column
+from datetime import timedelta
+from typing import Optional
+from models import Task
+from dependencies import Principal, get_current_principal, get_read_session
+from classification import QUADRANTS, classify_batch, quadrant_condition, utc_now
+from serialization import dumps, raw_json_response
+from versioning import conditional_get
+from cache import cache_scope, response_cache
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter(prefix="/stats", tags=["statistics"])
 
-URGENCY_THRESHOLD_DAYS = 3
 
+def time_bucket(dialect: str, unit: str, column):
+    if dialect == "postgresql":
+        # Единица подставляется литералом, чтобы выражения в SELECT и GROUP BY совпадали
+        return func.date_trunc(literal_column(f"'{unit}'"), column)
+    # SQLite: неделя начинается с понедельника, как и в date_trunc('week', ...)
+    if unit == "week":
+        return func.date(column, "weekday 0", "-6 days")
+    return func.date(column)
 
-def calculate_urgency(deadline_at: datetime) -> bool:
-    if not deadline_at:
-        return False
-    days_left = (deadline_at.replace(tzinfo=None) - datetime.now()).days
-    return days_left <= URGENCY_THRESHOLD_DAYS
 
-
-def calculate_quadrant(is_important: bool, is_urgent: bool) -> str:
-    if is_important and is_urgent:
-        return "Q1"
-    elif is_important and not is_urgent:
-        return "Q2"
-    elif not is_important and is_urgent:
-        return "Q3"
-    else:
-        return "Q4"
+def stats_from_row(row) -> dict:
+    return {
+        "total_tasks": row.total_tasks,
+        "by_quadrant": {q: row._mapping[q] for q in QUADRANTS},
+        "by_status": {"completed": row.completed, "pending": row.pending}
+    }
 
 
-@router.get("/")
+@router.get("/", response_model=dict)
 async def get_tasks_stats(
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
-) -> dict:
-    if current_user.role == "admin":
-        result = await db.execute(select(Task))
-    else:
-        result = await db.execute(select(Task).where(Task.user_id == current_user.id))
-    
-    tasks = result.scalars().all()
-
-    total_tasks = len(tasks)
-    by_quadrant = {"Q1": 0, "Q2": 0, "Q3": 0, "Q4": 0}
-    by_status = {"completed": 0, "pending": 0}
-
-    for task in tasks:
-        is_urgent = calculate_urgency(task.deadline_at)
-        quadrant = calculate_quadrant(task.is_important, is_urgent)
-        by_quadrant[quadrant] += 1
-        
-        if task.completed:
-            by_status["completed"] += 1
-        else:
-            by_status["pending"] += 1
-
-    return {
-        "total_tasks": total_tasks,
-        "by_quadrant": by_quadrant,
-        "by_status": by_status
+    request: Request,
+    group_by: Optional[str] = Query(None, description="Разбивка: user, day или week (по дате создания)"),
+    cache_headers: dict = Depends(conditional_get),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_principal)
+):
+    if group_by not in [None, "user", "day", "week"]:
+        raise HTTPException(status_code=400, detail="Недопустимая группировка. Используйте: user, day или week")
+
+    async def compute() -> bytes:
+        return dumps(await compute_tasks_stats(db, current_user, group_by))
+
+    body = await response_cache.get_or_compute(
+        "stats", cache_scope(current_user), str(request.url.query), compute
+    )
+    return raw_json_response(body, headers=cache_headers)
+
+
+async def compute_tasks_stats(db: AsyncSession, current_user: Principal, group_by: Optional[str]) -> dict:
+    now = utc_now()
+    columns = [
+        func.count(Task.id).label("total_tasks"),
+        *[func.count(Task.id).filter(quadrant_condition(q, now)).label(q) for q in QUADRANTS],
+        func.count(Task.id).filter(Task.completed == True).label("completed"),
+        func.count(Task.id).filter(Task.completed == False).label("pending"),
+    ]
+
+    group_key = None
+    if group_by == "user":
+        group_key = Task.user_id
+    elif group_by in ["day", "week"]:
+        group_key = time_bucket(db.bind.dialect.name, group_by, Task.created_at)
+
+    if group_key is not None:
+        columns.insert(0, group_key.label("key"))
+
+    query = select(*columns)
+    if current_user.role != "admin":
+        query = query.where(Task.user_id == current_user.id)
+    if group_key is not None:
+        query = query.group_by(group_key).order_by(group_key)
+
+    result = await db.execute(query)
+
+    if group_key is None:
+        return stats_from_row(result.one())
+
+    groups = [{"key": row.key, **stats_from_row(row)} for row in result.all()]
+
+    totals = {
+        "total_tasks": sum(g["total_tasks"] for g in groups),
+        "by_quadrant": {q: sum(g["by_quadrant"][q] for g in groups) for q in QUADRANTS},
+        "by_status": {
+            s: sum(g["by_status"][s] for g in groups) for s in ["completed", "pending"]
+        }
     }
+    return {**totals, "group_by": group_by, "groups": groups}
 
 
-@router.get("/deadlines")
+@router.get("/deadlines", response_model=dict)
 async def get_deadlines_stats(
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    within_days: Optional[int] = Query(None, ge=0, description="Только задачи с дедлайном в ближайшие N дней"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Сколько ближайших дедлайнов вернуть"),
+    cache_headers: dict = Depends(conditional_get),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_principal)
+):
+    async def compute() -> bytes:
+        return dumps(await compute_deadlines_stats(db, current_user, within_days, limit))
+
+    body = await response_cache.get_or_compute(
+        "stats_deadlines", cache_scope(current_user), str(request.url.query), compute
+    )
+    return raw_json_response(body, headers=cache_headers)
+
+
+async def compute_deadlines_stats(
+    db: AsyncSession, current_user: Principal, within_days: Optional[int], limit: int
 ) -> dict:
-    if current_user.role == "admin":
-        result = await db.execute(select(Task).where(Task.completed == False))
-    else:
-        result = await db.execute(
-            select(Task).where(
-                (Task.user_id == current_user.id) & (Task.completed == False)
-            )
-        )
-    
-    tasks = result.scalars().all()
-
-    deadlines = []
-    for task in tasks:
-        days_left = None
-        if task.deadline_at:
-            days_left = (task.deadline_at.replace(tzinfo=None) - datetime.now()).days
-
-        deadlines.append({
-            "id": task.id,
-            "title": task.title,
-            "description": task.description,
-            "created_at": task.created_at,
-            "deadline_at": task.deadline_at,
-            "days_until_deadline": days_left
-        })
-
-    deadlines.sort(key=lambda x: x["days_until_deadline"] if x["days_until_deadline"] is not None else 9999)
+    now = utc_now()
+    conditions = [Task.completed == False]
+    if current_user.role != "admin":
+        conditions.append(Task.user_id == current_user.id)
+
+    pending_tasks = await db.scalar(select(func.count(Task.id)).where(*conditions))
+
+    if within_days is not None:
+        conditions.append(Task.deadline_at < now + timedelta(days=within_days + 1))
+
+    # Порядок совпадает с ix_tasks_user_pending_deadline: LIMIT читает только начало диапазона
+    query = (
+        select(Task.id, Task.title, Task.description, Task.created_at, Task.deadline_at)
+        .where(*conditions)
+        .order_by(Task.deadline_at.asc().nulls_last(), Task.id)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    rows = result.all()
+    classifications = classify_batch([(False, row.deadline_at) for row in rows], now)
+
+    deadlines = [
+        {
+            "id": row.id,
+            "title": row.title,
+            "description": row.description,
+            "created_at": row.created_at,
+            "deadline_at": row.deadline_at,
+            "days_until_deadline": classification.days_until_deadline
+        }
+        for row, classification in zip(rows, classifications)
+    ]
 
     return {
-        "pending_tasks": len(deadlines),
+        "pending_tasks": pending_tasks,
         "tasks": deadlines
     }
@@ -1,177 +1,610 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Header, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from datetime import datetime
-from typing import List
-from schemas import TaskCreate, TaskUpdate, TaskResponse
-from database import get_async_session
-from models import Task, User
-from dependencies import get_current_user
+from sqlalchemy import select, insert, update, delete, tuple_, literal, false, Boolean, DateTime
+from datetime import datetime, time, timedelta, timezone
+from typing import List, Optional
+import csv
+import io
+from schemas import (
+    TaskCreate, TaskUpdate, TaskResponse, TaskPage,
+    TaskBulkCreate, TaskBulkUpdate, TaskBulkIds, BulkResult, TaskChanges,
+)
+from database import get_async_session, get_engine, read_router, sql_now
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PageParams,
+    encode_cursor, decode_cursor, parse_cursor_datetime, parse_cursor_int,
+)
+from models import Task, TaskTombstone
+from search import search_condition
+from serialization import json_response, raw_json_response, dumps
+from classification import (
+    Classification,
+    classify,
+    classify_batch,
+    quadrant_condition,
+    quadrant_expression,
+    utc_now,
+)
+from dependencies import Principal, get_current_principal, get_read_session
+from versioning import bump_tasks_version, conditional_get
+from cache import cache_scope, response_cache
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
-URGENCY_THRESHOLD_DAYS = 3
+TASK_COLUMNS = (
+    "id", "title", "description", "is_important", "completed",
+    "created_at", "completed_at", "deadline_at",
+)
+COMPUTED_FIELD_COLUMNS = {
+    "is_urgent": ("deadline_at",),
+    "quadrant": ("is_important", "deadline_at"),
+    "days_until_deadline": ("deadline_at",),
+}
+FIELDS_DESCRIPTION = "Список полей через запятую, например: id,title,quadrant"
+EXPORT_CHUNK_SIZE = 1000
+# Изменения моложе этого окна не отдаются: их транзакции могли ещё не закоммититься
+SYNC_SETTLE_SECONDS = 2
+
+
+def update_values(update_data: dict, now: datetime) -> dict:
+    is_important = (
+        literal(update_data["is_important"], Boolean)
+        if "is_important" in update_data else Task.is_important
+    )
+    deadline_at = (
+        literal(update_data["deadline_at"], DateTime(timezone=True))
+        if "deadline_at" in update_data else Task.deadline_at
+    )
+    return {**update_data, "quadrant": quadrant_expression(is_important, deadline_at, now)}
 
 
-def calculate_urgency(deadline_at: datetime) -> bool:
-    if not deadline_at:
-        return False
-    days_left = (deadline_at.replace(tzinfo=None) - datetime.now()).days
-    return days_left <= URGENCY_THRESHOLD_DAYS
+def returning_columns() -> list:
+    # user_id нужен, чтобы увеличить версию задач владельца
+    return [*(getattr(Task, name) for name in TASK_COLUMNS), Task.user_id]
 
 
-def calculate_quadrant(is_important: bool, is_urgent: bool) -> str:
-    if is_important and is_urgent:
-        return "Q1"
-    elif is_important and not is_urgent:
-        return "Q2"
-    elif not is_important and is_urgent:
-        return "Q3"
-    else:
-        return "Q4"
+async def classify_missing(db: AsyncSession, task_ids: List[int]) -> dict:
+    # Для строк, не попавших под UPDATE/DELETE, отличаем "нет такой задачи" от "чужая задача"
+    if not task_ids:
+        return {}
+    result = await db.execute(select(Task.id).where(Task.id.in_(task_ids)))
+    existing = set(result.scalars().all())
+    return {task_id: "forbidden" if task_id in existing else "not_found" for task_id in task_ids}
 
 
-def calculate_days_until_deadline(deadline_at: datetime) -> int | None:
-    if not deadline_at:
-        return None
-    return (deadline_at.replace(tzinfo=None) - datetime.now()).days
+async def record_tombstones(db: AsyncSession, deleted_rows) -> None:
+    if deleted_rows:
+        await db.execute(
+            insert(TaskTombstone).values([
+                {"task_id": row.id, "user_id": row.user_id} for row in deleted_rows
+            ])
+        )
+
+
+async def commit_task_changes(db: AsyncSession, user_ids) -> None:
+    user_ids = list(user_ids)
+    await bump_tasks_version(db, user_ids)
+    await db.commit()
+    # Сбрасываем кэш только после коммита, иначе параллельный запрос закэширует старые данные
+    await response_cache.invalidate(user_ids)
+
+
+async def raise_task_unavailable(db: AsyncSession, task_id: int) -> None:
+    # Вызывается только при промахе UPDATE/DELETE, чтобы вернуть 404 или 403
+    missing = await classify_missing(db, [task_id])
+    if missing[task_id] == "not_found":
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    raise HTTPException(status_code=403, detail="Нет доступа к этой задаче")
 
 
-def task_to_response(task: Task) -> dict:
-    is_urgent = calculate_urgency(task.deadline_at)
+def task_to_response(task: Task, classification: Optional[Classification] = None) -> dict:
+    if classification is None:
+        classification = classify(task.is_important, task.deadline_at, utc_now())
     return {
         "id": task.id,
         "title": task.title,
         "description": task.description,
         "is_important": task.is_important,
-        "is_urgent": is_urgent,
-        "quadrant": calculate_quadrant(task.is_important, is_urgent),
+        "is_urgent": classification.is_urgent,
+        "quadrant": classification.quadrant,
         "completed": task.completed,
         "created_at": task.created_at,
         "completed_at": task.completed_at,
         "deadline_at": task.deadline_at,
-        "days_until_deadline": calculate_days_until_deadline(task.deadline_at)
+        "days_until_deadline": classification.days_until_deadline
     }
 
 
-@router.get("", response_model=List[TaskResponse])
-async def get_all_tasks(
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
-):
+def today_conditions(now: datetime) -> list:
+    day_start = datetime.combine(now.astimezone(timezone.utc).date(), time.min, tzinfo=timezone.utc)
+    day_end = day_start + timedelta(days=1)
+    return [
+        Task.completed == False,
+        Task.deadline_at >= day_start,
+        Task.deadline_at < day_end,
+    ]
+
+
+def task_scope(current_user: Principal) -> list:
     if current_user.role == "admin":
-        result = await db.execute(select(Task))
+        return []
+    return [Task.user_id == current_user.id]
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in TaskResponse.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные поля: {', '.join(unknown)}. Доступные: {', '.join(TaskResponse.model_fields)}"
+        )
+    return [name for name in TaskResponse.model_fields if name in requested]
+
+
+def select_task_columns(fields: Optional[List[str]], required: tuple = ("id", "created_at")) -> list:
+    if fields is None:
+        needed = set(TASK_COLUMNS)
     else:
-        result = await db.execute(select(Task).where(Task.user_id == current_user.id))
-    
-    tasks = result.scalars().all()
-    return [task_to_response(t) for t in tasks]
+        # Колонки ключа пагинации нужны всегда, даже если их нет в fields
+        needed = set(required)
+        for name in fields:
+            needed.update(COMPUTED_FIELD_COLUMNS.get(name, (name,)))
+    return [getattr(Task, name) for name in TASK_COLUMNS if name in needed]
+
+
+def rows_to_response(rows, fields: Optional[List[str]] = None, now: Optional[datetime] = None) -> List[dict]:
+    # Один снимок "сейчас" и одна классификация на весь набор строк
+    classifications = classify_batch(
+        [(getattr(row, "is_important", False), getattr(row, "deadline_at", None)) for row in rows],
+        now,
+    )
+    if fields is None:
+        return [task_to_response(row, c) for row, c in zip(rows, classifications)]
+
+    items = []
+    for row, classification in zip(rows, classifications):
+        values = {**row._mapping, **classification._asdict()}
+        items.append({name: values[name] for name in fields})
+    return items
+
+
+async def fetch_task_page(
+    db: AsyncSession,
+    conditions: list,
+    page: PageParams,
+    fields: Optional[List[str]],
+    now: datetime,
+    sort_column: str = "created_at",
+):
+    # now — тот же снимок времени, что и в условиях conditions, иначе строка может попасть в выборку
+    # по одному квадранту, а в ответе получить другой
+    # Keyset по (sort_column, id); колонка сортировки должна быть NOT NULL в выборке
+    key = getattr(Task, sort_column)
+    query = select(*select_task_columns(fields, ("id", sort_column))).where(*conditions)
+
+    if page.cursor:
+        value, task_id = decode_cursor(page.cursor, 2)
+        query = query.where(tuple_(key, Task.id) > (parse_cursor_datetime(value), parse_cursor_int(task_id)))
+
+    query = query.order_by(key, Task.id).limit(page.limit + 1)
+    result = await db.execute(query)
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor(getattr(rows[-1], sort_column), rows[-1].id)
+
+    return rows_to_response(rows, fields, now), next_cursor
 
 
-@router.get("/quadrant/{quadrant}", response_model=List[TaskResponse])
+def build_task_page(items: List[dict], next_cursor: Optional[str], headers: Optional[dict] = None):
+    # Строки уже приведены к TaskResponse в rows_to_response, сериализуем их сразу в JSON
+    return json_response({"items": items, "next_cursor": next_cursor}, headers=headers)
+
+
+@router.get("", response_model=TaskPage)
+async def get_all_tasks(
+    page: PageParams = Depends(),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    cache_headers: dict = Depends(conditional_get),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_principal)
+):
+    selected = parse_fields(fields)
+    items, next_cursor = await fetch_task_page(db, task_scope(current_user), page, selected, utc_now())
+    return build_task_page(items, next_cursor, cache_headers)
+
+
+@router.get("/quadrant/{quadrant}", response_model=TaskPage)
 async def get_tasks_by_quadrant(
     quadrant: str,
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    page: PageParams = Depends(),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    cache_headers: dict = Depends(conditional_get),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_principal)
 ):
     if quadrant not in ["Q1", "Q2", "Q3", "Q4"]:
         raise HTTPException(status_code=400, detail="Неверный квадрант. Используйте: Q1, Q2, Q3, Q4")
-    
-    if current_user.role == "admin":
-        result = await db.execute(select(Task))
-    else:
-        result = await db.execute(select(Task).where(Task.user_id == current_user.id))
-    
-    tasks = result.scalars().all()
-    filtered = [task_to_response(t) for t in tasks if task_to_response(t)["quadrant"] == quadrant]
-    return filtered
+
+    selected = parse_fields(fields)
+    now = utc_now()
+    conditions = [quadrant_condition(quadrant, now), *task_scope(current_user)]
+    items, next_cursor = await fetch_task_page(db, conditions, page, selected, now)
+    return build_task_page(items, next_cursor, cache_headers)
 
 
-@router.get("/search", response_model=List[TaskResponse])
+@router.get("/search", response_model=TaskPage)
 async def search_tasks(
-    keyword: str = Query(..., min_length=2, description="Ключевое слово для поиска"),
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    keyword: str = Query(..., min_length=2, description="Слова для поиска; фраза — в кавычках"),
+    not_found_error: bool = Query(False, description="Вернуть 404, если ничего не найдено"),
+    page: PageParams = Depends(),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    cache_headers: dict = Depends(conditional_get),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    search_pattern = f"%{keyword.lower()}%"
-    
-    if current_user.role == "admin":
-        result = await db.execute(
-            select(Task).where(
-                (Task.title.ilike(search_pattern)) | (Task.description.ilike(search_pattern))
-            )
+    selected = parse_fields(fields)
+    offset = parse_cursor_int(decode_cursor(page.cursor, 1)[0]) if page.cursor else 0
+
+    condition, rank = search_condition(db.bind.dialect.name, keyword)
+    rows = []
+    if condition is not None:
+        ordering = [rank.desc()] if rank is not None else []
+        query = (
+            select(*select_task_columns(selected))
+            .where(condition, *task_scope(current_user))
+            .order_by(*ordering, Task.created_at, Task.id)
+            .offset(offset)
+            .limit(page.limit + 1)
         )
-    else:
-        result = await db.execute(
-            select(Task).where(
-                (Task.user_id == current_user.id) &
-                ((Task.title.ilike(search_pattern)) | (Task.description.ilike(search_pattern)))
-            )
-        )
-    
-    tasks = result.scalars().all()
-    if not tasks:
+        result = await db.execute(query)
+        rows = result.all()
+
+    # Порядок по релевантности не ключевой, поэтому курсор хранит смещение
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor(offset + page.limit)
+
+    if not rows and not_found_error and page.cursor is None:
         raise HTTPException(status_code=404, detail="По данному запросу ничего не найдено")
-    return [task_to_response(t) for t in tasks]
 
+    items = rows_to_response(rows, selected)
+    return build_task_page(items, next_cursor, cache_headers)
 
-@router.get("/today", response_model=List[TaskResponse])
+
+@router.get("/today", response_model=TaskPage)
 async def get_tasks_today(
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    page: PageParams = Depends(),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    cache_headers: dict = Depends(conditional_get),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    today = datetime.now().date()
-    
-    if current_user.role == "admin":
-        result = await db.execute(select(Task).where(Task.completed == False))
-    else:
-        result = await db.execute(
-            select(Task).where(
-                (Task.user_id == current_user.id) & (Task.completed == False)
-            )
+    selected = parse_fields(fields)
+    now = utc_now()
+    conditions = [*today_conditions(now), *task_scope(current_user)]
+
+    async def compute() -> bytes:
+        # Диапазон по deadline_at читается из ix_tasks_user_pending_deadline уже в нужном порядке
+        items, next_cursor = await fetch_task_page(
+            db, conditions, page, selected, now, sort_column="deadline_at"
         )
-    
-    tasks = result.scalars().all()
-    today_tasks = []
-    
-    for task in tasks:
-        if task.deadline_at:
-            deadline_date = task.deadline_at.replace(tzinfo=None).date()
-            if deadline_date == today:
-                today_tasks.append(task_to_response(task))
-    
-    return today_tasks
+        return dumps({"items": items, "next_cursor": next_cursor})
+
+    body = await response_cache.get_or_compute(
+        "tasks_today", cache_scope(current_user), str(request.url.query), compute
+    )
+    return raw_json_response(body, headers=cache_headers)
 
 
-@router.get("/status/{status}", response_model=List[TaskResponse])
+@router.get("/status/{status}", response_model=TaskPage)
 async def get_tasks_by_status(
     status: str,
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    page: PageParams = Depends(),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    cache_headers: dict = Depends(conditional_get),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_principal)
 ):
     if status not in ["completed", "pending"]:
         raise HTTPException(status_code=400, detail="Недопустимый статус. Используйте: completed или pending")
-    
+
     is_completed = (status == "completed")
-    
-    if current_user.role == "admin":
-        result = await db.execute(select(Task).where(Task.completed == is_completed))
-    else:
-        result = await db.execute(
-            select(Task).where(
-                (Task.user_id == current_user.id) & (Task.completed == is_completed)
+
+    selected = parse_fields(fields)
+    conditions = [Task.completed == is_completed, *task_scope(current_user)]
+    items, next_cursor = await fetch_task_page(db, conditions, page, selected, utc_now())
+    return build_task_page(items, next_cursor, cache_headers)
+
+
+def sync_position(rows, until: datetime, limit: int, timestamp: str) -> tuple:
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        return (getattr(last, timestamp), last.id), True
+    # Всё до границы until прочитано — следующий запрос начнётся с неё
+    return (until, 0), False
+
+
+def parse_sync_position(timestamp, row_id) -> Optional[tuple]:
+    if timestamp is None:
+        return None
+    return parse_cursor_datetime(timestamp), parse_cursor_int(row_id)
+
+
+@router.get("/changes", response_model=TaskChanges)
+async def get_task_changes(
+    since: Optional[str] = Query(None, description="Токен next_token из предыдущего ответа; без него — полная выгрузка"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Максимум записей каждого вида"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal)
+):
+    tasks_position, deleted_position = None, None
+    if since:
+        tasks_ts, tasks_id, deleted_ts, deleted_id = decode_cursor(since, 4)
+        tasks_position = parse_sync_position(tasks_ts, tasks_id)
+        deleted_position = parse_sync_position(deleted_ts, deleted_id)
+
+    # Только основная БД: на отстающей реплике токен мог бы перескочить ещё не доехавшие изменения.
+    # Часы БД, а не приложения: updated_at и deleted_at выставляет сервер БД
+    db_now = (await db.execute(select(sql_now()))).scalar_one()
+    until = db_now - timedelta(seconds=SYNC_SETTLE_SECONDS)
+
+    tasks_query = (
+        select(*returning_columns(), Task.updated_at)
+        .where(Task.updated_at < until, *task_scope(current_user))
+        .order_by(Task.updated_at, Task.id)
+        .limit(limit + 1)
+    )
+    if tasks_position is not None:
+        tasks_query = tasks_query.where(tuple_(Task.updated_at, Task.id) > tasks_position)
+    changed = (await db.execute(tasks_query)).all()
+
+    deleted = []
+    if since:
+        # Клиенту без локальных данных удаления не нужны
+        deleted_query = (
+            select(TaskTombstone.id, TaskTombstone.task_id, TaskTombstone.deleted_at)
+            .where(TaskTombstone.deleted_at < until)
+            .order_by(TaskTombstone.deleted_at, TaskTombstone.id)
+            .limit(limit + 1)
+        )
+        if current_user.role != "admin":
+            deleted_query = deleted_query.where(TaskTombstone.user_id == current_user.id)
+        if deleted_position is not None:
+            deleted_query = deleted_query.where(
+                tuple_(TaskTombstone.deleted_at, TaskTombstone.id) > deleted_position
             )
+        deleted = (await db.execute(deleted_query)).all()
+
+    tasks_position, tasks_more = sync_position(changed, until, limit, "updated_at")
+    deleted_position, deleted_more = sync_position(deleted, until, limit, "deleted_at")
+
+    return json_response({
+        "changed": rows_to_response(changed[:limit]),
+        "deleted": [{"id": row.task_id, "deleted_at": row.deleted_at} for row in deleted[:limit]],
+        "next_token": encode_cursor(*tasks_position, *deleted_position),
+        "has_more": tasks_more or deleted_more,
+    })
+
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def stream_export(session_maker, query, export_format: str, fields: List[str], now: datetime):
+    # Сессия из зависимости закрывается до отправки тела ответа, поэтому открываем свою
+    async with session_maker() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(fields)
+            yield buffer.getvalue()
+
+        async for rows in result.partitions():
+            # Снимок времени фильтра, а не текущие часы: выгрузка может длиться дольше порога срочности
+            items = rows_to_response(rows, fields, now)
+            if export_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows([export_value(item[name]) for name in fields] for item in items)
+                yield buffer.getvalue()
+            else:
+                yield b"".join(dumps(item) + b"\n" for item in items)
+
+
+@router.get("/export")
+async def export_tasks(
+    format: str = Query("ndjson", description="Формат выгрузки: ndjson или csv"),
+    status: Optional[str] = Query(None, description="completed или pending"),
+    quadrant: Optional[str] = Query(None, description="Q1, Q2, Q3 или Q4"),
+    keyword: Optional[str] = Query(None, min_length=2, description="Слова для поиска"),
+    today: bool = Query(False, description="Только незавершённые задачи с дедлайном сегодня"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    x_read_consistency: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_principal)
+):
+    if format not in ["ndjson", "csv"]:
+        raise HTTPException(status_code=400, detail="Недопустимый формат. Используйте: ndjson или csv")
+    if status not in [None, "completed", "pending"]:
+        raise HTTPException(status_code=400, detail="Недопустимый статус. Используйте: completed или pending")
+    if quadrant not in [None, "Q1", "Q2", "Q3", "Q4"]:
+        raise HTTPException(status_code=400, detail="Неверный квадрант. Используйте: Q1, Q2, Q3, Q4")
+
+    selected = parse_fields(fields) or list(TaskResponse.model_fields)
+    now = utc_now()
+
+    conditions = task_scope(current_user)
+    if status is not None:
+        conditions.append(Task.completed == (status == "completed"))
+    if quadrant is not None:
+        conditions.append(quadrant_condition(quadrant, now))
+    if today:
+        conditions.extend(today_conditions(now))
+    if keyword is not None:
+        condition, _ = search_condition(get_engine().dialect.name, keyword)
+        conditions.append(condition if condition is not None else false())
+
+    query = (
+        select(*select_task_columns(selected))
+        .where(*conditions)
+        .order_by(Task.created_at, Task.id)
+    )
+
+    session_maker = await read_router.session_maker_for(
+        current_user.id, strong=(x_read_consistency or "").lower() == "strong"
+    )
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(session_maker, query, format, selected, now),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'},
+    )
+
+
+@router.post("/bulk", response_model=BulkResult, status_code=status.HTTP_201_CREATED)
+async def create_tasks_bulk(
+    payload: TaskBulkCreate,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal)
+):
+    now = utc_now()
+    classifications = classify_batch([(task.is_important, task.deadline_at) for task in payload.items], now)
+    rows = [
+        {
+            "title": task.title,
+            "description": task.description,
+            "is_important": task.is_important,
+            "quadrant": classification.quadrant,
+            "completed": False,
+            "deadline_at": task.deadline_at,
+            "user_id": current_user.id,
+        }
+        for task, classification in zip(payload.items, classifications)
+    ]
+
+    # Многострочный VALUES ... RETURNING не обязан возвращать строки в порядке вставки;
+    # sort_by_parameter_order гарантирует, что results[i] соответствует items[i]
+    result = await db.execute(insert(Task).returning(*returning_columns(), sort_by_parameter_order=True), rows)
+    created = result.all()
+    await commit_task_changes(db, [current_user.id])
+
+    return {
+        "results": [
+            {"id": row.id, "status": "created", "task": task}
+            for row, task in zip(created, rows_to_response(created, now=now))
+        ]
+    }
+
+
+@router.put("/bulk", response_model=BulkResult)
+async def update_tasks_bulk(
+    payload: TaskBulkUpdate,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal)
+):
+    now = utc_now()
+    updated = {}
+    # Наборы полей у элементов разные, поэтому UPDATE на элемент, но в одной транзакции и без SELECT
+    for item in payload.items:
+        update_data = item.model_dump(exclude_unset=True, exclude={"id"})
+        result = await db.execute(
+            update(Task)
+            .where(Task.id == item.id, *task_scope(current_user))
+            .values(**update_values(update_data, now))
+            .returning(*returning_columns())
+            .execution_options(synchronize_session=False)
         )
-    
-    tasks = result.scalars().all()
-    return [task_to_response(t) for t in tasks]
+        row = result.one_or_none()
+        if row is not None:
+            updated[item.id] = row
+
+    missing = await classify_missing(db, [item.id for item in payload.items if item.id not in updated])
+    await commit_task_changes(db, [row.user_id for row in updated.values()])
+
+    responses = dict(zip(updated, rows_to_response(list(updated.values()), now=now)))
+    results = []
+    for item in payload.items:
+        if item.id in updated:
+            results.append({"id": item.id, "status": "updated", "task": responses[item.id]})
+        else:
+            results.append({"id": item.id, "status": missing[item.id]})
+    return {"results": results}
+
+
+@router.patch("/bulk/complete", response_model=BulkResult)
+async def complete_tasks_bulk(
+    payload: TaskBulkIds,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal)
+):
+    now = utc_now()
+    task_ids = list(dict.fromkeys(payload.ids))
+    result = await db.execute(
+        update(Task)
+        .where(Task.id.in_(task_ids), *task_scope(current_user))
+        .values(completed=True, completed_at=now)
+        .returning(*returning_columns())
+        .execution_options(synchronize_session=False)
+    )
+    completed = {row.id: row for row in result.all()}
+    missing = await classify_missing(db, [task_id for task_id in task_ids if task_id not in completed])
+    await commit_task_changes(db, [row.user_id for row in completed.values()])
+
+    responses = dict(zip(completed, rows_to_response(list(completed.values()), now=now)))
+    results = []
+    for task_id in task_ids:
+        if task_id in completed:
+            results.append({"id": task_id, "status": "completed", "task": responses[task_id]})
+        else:
+            results.append({"id": task_id, "status": missing[task_id]})
+    return {"results": results}
+
+
+@router.delete("/bulk", response_model=BulkResult)
+async def delete_tasks_bulk(
+    payload: TaskBulkIds,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: Principal = Depends(get_current_principal)
+):
+    task_ids = list(dict.fromkeys(payload.ids))
+    result = await db.execute(
+        delete(Task)
+        .where(Task.id.in_(task_ids), *task_scope(current_user))
+        .returning(Task.id, Task.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted_rows = result.all()
+    deleted = {row.id for row in deleted_rows}
+    missing = await classify_missing(db, [task_id for task_id in task_ids if task_id not in deleted])
+    await record_tombstones(db, deleted_rows)
+    await commit_task_changes(db, [row.user_id for row in deleted_rows])
+
+    return {
+        "results": [
+            {"id": task_id, "status": "deleted" if task_id in deleted else missing[task_id]}
+            for task_id in task_ids
+        ]
+    }
 
 
 @router.get("/{task_id}", response_model=TaskResponse)
 async def get_task_by_id(
     task_id: int,
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_principal)
 ):
     result = await db.execute(select(Task).where(Task.id == task_id))
     task = result.scalar_one_or_none()
@@ -189,25 +622,24 @@ async def get_task_by_id(
 async def create_task(
     task: TaskCreate,
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    is_urgent = calculate_urgency(task.deadline_at)
-    quadrant = calculate_quadrant(task.is_important, is_urgent)
+    classification = classify(task.is_important, task.deadline_at, utc_now())
 
     new_task = Task(
         title=task.title,
         description=task.description,
         is_important=task.is_important,
-        quadrant=quadrant,
+        quadrant=classification.quadrant,
         completed=False,
         deadline_at=task.deadline_at,
         user_id=current_user.id
     )
 
     db.add(new_task)
-    await db.commit()
+    await commit_task_changes(db, [current_user.id])
     await db.refresh(new_task)
-    return task_to_response(new_task)
+    return task_to_response(new_task, classification)
 
 
 @router.put("/{task_id}", response_model=TaskResponse)
@@ -215,70 +647,65 @@ async def update_task(
     task_id: int,
     task_update: TaskUpdate,
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    result = await db.execute(select(Task).where(Task.id == task_id))
-    task = result.scalar_one_or_none()
-    
-    if not task:
-        raise HTTPException(status_code=404, detail="Задача не найдена")
-    
-    if current_user.role != "admin" and task.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Нет доступа к этой задаче")
-
     update_data = task_update.model_dump(exclude_unset=True)
+    now = utc_now()
+
+    result = await db.execute(
+        update(Task)
+        .where(Task.id == task_id, *task_scope(current_user))
+        .values(**update_values(update_data, now))
+        .returning(*returning_columns())
+        .execution_options(synchronize_session=False)
+    )
+    row = result.one_or_none()
+    if row is None:
+        await raise_task_unavailable(db, task_id)
 
-    for field, value in update_data.items():
-        setattr(task, field, value)
-
-    is_urgent = calculate_urgency(task.deadline_at)
-    task.quadrant = calculate_quadrant(task.is_important, is_urgent)
-
-    await db.commit()
-    await db.refresh(task)
-    return task_to_response(task)
+    await commit_task_changes(db, [row.user_id])
+    # Тот же снимок, по которому в БД записан quadrant
+    return rows_to_response([row], now=now)[0]
 
 
 @router.delete("/{task_id}", status_code=status.HTTP_200_OK)
 async def delete_task(
     task_id: int,
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    result = await db.execute(select(Task).where(Task.id == task_id))
-    task = result.scalar_one_or_none()
-    
-    if not task:
-        raise HTTPException(status_code=404, detail="Задача не найдена")
-    
-    if current_user.role != "admin" and task.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Нет доступа к этой задаче")
+    result = await db.execute(
+        delete(Task)
+        .where(Task.id == task_id, *task_scope(current_user))
+        .returning(Task.id, Task.title, Task.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.one_or_none()
+    if row is None:
+        await raise_task_unavailable(db, task_id)
 
-    deleted_info = {"id": task.id, "title": task.title}
-    await db.delete(task)
-    await db.commit()
+    await record_tombstones(db, [row])
+    await commit_task_changes(db, [row.user_id])
 
-    return {"message": "Задача успешно удалена", **deleted_info}
+    return {"message": "Задача успешно удалена", "id": row.id, "title": row.title}
 
 
 @router.patch("/{task_id}/complete", response_model=TaskResponse)
 async def complete_task(
     task_id: int,
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
-    result = await db.execute(select(Task).where(Task.id == task_id))
-    task = result.scalar_one_or_none()
-    
-    if not task:
-        raise HTTPException(status_code=404, detail="Задача не найдена")
-    
-    if current_user.role != "admin" and task.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Нет доступа к этой задаче")
-
-    task.completed = True
-    task.completed_at = datetime.now()
+    result = await db.execute(
+        update(Task)
+        .where(Task.id == task_id, *task_scope(current_user))
+        .values(completed=True, completed_at=utc_now())
+        .returning(*returning_columns())
+        .execution_options(synchronize_session=False)
+    )
+    row = result.one_or_none()
+    if row is None:
+        await raise_task_unavailable(db, task_id)
 
-    await db.commit()
-    await db.refresh(task)
-    return task_to_response(task)
+    await commit_task_changes(db, [row.user_id])
+    return task_to_response(row)
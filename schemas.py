@@ -1,7 +1,9 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
+BULK_MAX_ITEMS = 100
+
 
 class TaskBase(BaseModel):
     title: str = Field(..., min_length=3, max_length=100, description="Название задачи")
@@ -33,3 +35,46 @@ class TaskResponse(TaskBase):
 
     class Config:
         from_attributes = True
+
+
+class TaskPage(BaseModel):
+    items: List[TaskResponse]
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы")
+
+
+class TaskBulkCreate(BaseModel):
+    items: List[TaskCreate] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class TaskBulkUpdateItem(TaskUpdate):
+    id: int
+
+
+class TaskBulkUpdate(BaseModel):
+    items: List[TaskBulkUpdateItem] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class TaskBulkIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class BulkItemResult(BaseModel):
+    id: Optional[int] = None
+    status: str = Field(description="created, updated, completed, deleted, not_found или forbidden")
+    task: Optional[TaskResponse] = None
+
+
+class BulkResult(BaseModel):
+    results: List[BulkItemResult]
+
+
+class TaskDeleted(BaseModel):
+    id: int
+    deleted_at: datetime
+
+
+class TaskChanges(BaseModel):
+    changed: List[TaskResponse] = Field(description="Созданные и изменённые задачи")
+    deleted: List[TaskDeleted] = Field(description="Удалённые задачи")
+    next_token: str = Field(description="Токен для следующего запроса изменений")
+    has_more: bool = Field(description="Есть ещё изменения, запросите их с next_token")
@@ -0,0 +1,46 @@
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, or_, func, literal_column
+from models import Task
+from models.task import SEARCH_CONFIG, task_search_document
+
+QUERY_TOKEN_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def parse_search_query(keyword: str) -> Tuple[List[List[str]], List[str]]:
+    phrases, words = [], []
+    for phrase, word in QUERY_TOKEN_PATTERN.findall(keyword.lower()):
+        if phrase:
+            tokens = WORD_PATTERN.findall(phrase)
+            if tokens:
+                phrases.append(tokens)
+        else:
+            words.extend(WORD_PATTERN.findall(word))
+    return phrases, words
+
+
+def build_tsquery(phrases: List[List[str]], words: List[str]) -> str:
+    # Фразы в кавычках — точная последовательность слов, остальные слова — поиск по префиксу
+    parts = [" <-> ".join(tokens) for tokens in phrases]
+    parts += [f"{word}:*" for word in words]
+    return " & ".join(parts)
+
+
+def search_condition(dialect: str, keyword: str) -> Tuple[Optional[object], Optional[object]]:
+    phrases, words = parse_search_query(keyword)
+    if not phrases and not words:
+        return None, None
+
+    if dialect == "postgresql":
+        document = task_search_document(Task.title, Task.description)
+        query = func.to_tsquery(literal_column(f"'{SEARCH_CONFIG}'"), build_tsquery(phrases, words))
+        return document.op("@@")(query), func.ts_rank_cd(document, query)
+
+    # Переносимый вариант (SQLite и др.): каждое слово/фраза должны встретиться в названии или описании
+    terms = [" ".join(tokens) for tokens in phrases] + words
+    condition = and_(*[
+        or_(Task.title.ilike(f"%{term}%"), Task.description.ilike(f"%{term}%"))
+        for term in terms
+    ])
+    return condition, None
@@ -0,0 +1,31 @@
+from typing import Any, Optional
+import time
+import orjson
+from fastapi import Response
+from metrics import observe_phase
+
+# OPT_UTC_Z: UTC как "Z", так же как сериализует Pydantic
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content: Any) -> bytes:
+    started = time.perf_counter()
+    try:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+    finally:
+        observe_phase("serialize", time.perf_counter() - started)
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    # Готовый Response не проходит повторную валидацию response_model,
+    # при этом схема OpenAPI по-прежнему строится из response_model маршрута
+    return raw_json_response(dumps(content), status_code, headers)
+
+
+def raw_json_response(body: bytes, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    return Response(
+        content=body,
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
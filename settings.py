@@ -0,0 +1,72 @@
+import os
+from typing import List, Optional
+from dotenv import load_dotenv
+
+
+def env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_list(name: str) -> List[str]:
+    return [value.strip() for value in os.getenv(name, "").split(",") if value.strip()]
+
+
+class Settings:
+    def __init__(self):
+        self.database_url: Optional[str] = os.getenv("DATABASE_URL")
+        # Реплики только для чтения, через запятую
+        self.database_replica_urls = env_list("DATABASE_REPLICA_URLS")
+        # Сколько секунд после записи пользователь читает с основной БД
+        self.read_your_writes_seconds = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+        self.db_echo = env_flag("DB_ECHO")
+        self.db_pool_size = int(os.getenv("DB_POOL_SIZE", "10"))
+        self.db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+        self.db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        self.db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        # Сколько соединений открыть при старте, до того как /ready ответит 200
+        self.db_pool_warmup = int(os.getenv("DB_POOL_WARMUP", str(min(5, self.db_pool_size))))
+        # PgBouncer/Supavisor в режиме transaction не поддерживают подготовленные выражения asyncpg.
+        # При прямом подключении к PostgreSQL выставьте false, чтобы включить кэш выражений.
+        self.db_pgbouncer_transaction_mode = env_flag("DB_PGBOUNCER_TRANSACTION_MODE", "true")
+        self.db_statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+        self.secret_key = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
+        # Access-токен проверяется без запроса в БД, поэтому живёт недолго; продлевается refresh-токеном
+        self.access_token_expire_minutes = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+        self.refresh_token_expire_days = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+        self.token_cache_size = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+        self.bcrypt_rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+        self.password_hash_workers = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.password_hash_max_pending = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+        self.user_cache_size = int(os.getenv("USER_CACHE_SIZE", "10000"))
+        self.user_cache_ttl_seconds = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+
+        # memory:// — кэш в процессе; redis://host:port/db — общий для всех воркеров
+        self.cache_url = os.getenv("CACHE_URL", "memory://")
+        self.response_cache_ttl_seconds = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+        self.response_cache_size = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+        # Где хранить метки read-your-writes; при нескольких воркерах нужен общий Redis
+        self.read_your_writes_url = os.getenv("READ_YOUR_WRITES_URL", self.cache_url)
+
+        # Лимиты в формате "N/second|minute|hour"; пустое значение или 0 отключает лимит
+        self.rate_limit_url = os.getenv("RATE_LIMIT_URL", "memory://")
+        self.rate_limit_login_ip = os.getenv("RATE_LIMIT_LOGIN_IP", "20/minute")
+        self.rate_limit_login_account = os.getenv("RATE_LIMIT_LOGIN_ACCOUNT", "5/minute")
+        self.rate_limit_register_ip = os.getenv("RATE_LIMIT_REGISTER_IP", "10/hour")
+        self.rate_limit_password_user = os.getenv("RATE_LIMIT_PASSWORD_USER", "5/minute")
+        self.rate_limit_refresh_ip = os.getenv("RATE_LIMIT_REFRESH_IP", "60/minute")
+        self.rate_limit_api_user = os.getenv("RATE_LIMIT_API_USER", "600/minute")
+        # Брать IP клиента из X-Forwarded-For: только за доверенным прокси
+        self.rate_limit_trust_forwarded = env_flag("RATE_LIMIT_TRUST_FORWARDED")
+
+        self.etag_time_bucket_seconds = int(os.getenv("ETAG_TIME_BUCKET_SECONDS", "60"))
+        self.reclassify_interval_seconds = float(os.getenv("RECLASSIFY_INTERVAL_SECONDS", "60"))
+        # Server-Timing раскрывает внутренние тайминги, поэтому включается явно
+        self.metrics_server_timing = env_flag("METRICS_SERVER_TIMING")
+
+
+# .env читается один раз на процесс, до первого обращения к настройкам
+load_dotenv()
+settings = Settings()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+
+# Настройки читаются при импорте приложения, поэтому окружение задаётся до него
+_db_dir = tempfile.mkdtemp(prefix="todo-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_dir}/test.db"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["METRICS_SERVER_TIMING"] = "true"
+for _name in (
+    "RATE_LIMIT_LOGIN_IP", "RATE_LIMIT_LOGIN_ACCOUNT", "RATE_LIMIT_REGISTER_IP",
+    "RATE_LIMIT_PASSWORD_USER", "RATE_LIMIT_REFRESH_IP", "RATE_LIMIT_API_USER",
+):
+    os.environ[_name] = "0"
+
+import re  # noqa: E402
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from auth_utils import token_cache  # noqa: E402
+from cache import MemoryCacheBackend, response_cache  # noqa: E402
+from database import drop_db, init_db  # noqa: E402
+from dependencies import user_cache  # noqa: E402
+from main import app  # noqa: E402
+
+API_PREFIX = "/api/v3"
+PASSWORD = "secret-password"
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    await drop_db()
+    await init_db()
+    # Кэши живут в процессе и пережили бы пересоздание базы
+    user_cache.clear()
+    token_cache.clear()
+    response_cache.backend = MemoryCacheBackend(maxsize=100)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url=f"http://test{API_PREFIX}") as http:
+        yield http
+
+
+async def register_user(client: httpx.AsyncClient, nickname: str) -> dict:
+    email = f"{nickname}@example.com"
+    response = await client.post("/auth/register", json={"nickname": nickname, "email": email, "password": PASSWORD})
+    assert response.status_code == 201, response.text
+    response = await client.post("/auth/login", data={"username": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def create_tasks(client, headers, count: int) -> list:
+    # Одна вставка: у всех задач одинаковое время создания вплоть до секунды
+    items = [
+        {"title": f"Задача {i}", "is_important": i % 2 == 0, "deadline_at": "2030-01-01T00:00:00Z"}
+        for i in range(count)
+    ]
+    response = await client.post("/tasks/bulk", json={"items": items}, headers=headers)
+    assert response.status_code == 201, response.text
+    return [item["id"] for item in response.json()["results"]]
+
+
+def statement_count(response: httpx.Response) -> int:
+    # Число SQL-запросов за HTTP-запрос из заголовка Server-Timing (metrics.MetricsMiddleware)
+    return int(SERVER_TIMING_QUERIES.search(response.headers["server-timing"]).group(1))
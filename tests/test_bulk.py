@@ -0,0 +1,26 @@
+import pytest
+
+from conftest import register_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bulk_create_results_follow_request_order(client):
+    headers = await register_user(client, "bulker")
+    titles = [f"Задача {name}" for name in ("я", "б", "ю", "а", "в", "э", "г")]
+    items = [
+        {"title": title, "is_important": i % 2 == 0, "deadline_at": f"2030-01-0{i + 1}T00:00:00Z"}
+        for i, title in enumerate(titles)
+    ]
+
+    response = await client.post("/tasks/bulk", json={"items": items}, headers=headers)
+
+    assert response.status_code == 201, response.text
+    results = response.json()["results"]
+    assert [result["task"]["title"] for result in results] == titles
+    assert [result["task"]["is_important"] for result in results] == [item["is_important"] for item in items]
+    assert [result["id"] for result in results] == [result["task"]["id"] for result in results]
+
+    for result, title in zip(results, titles):
+        response = await client.get(f"/tasks/{result['id']}", headers=headers)
+        assert response.json()["title"] == title
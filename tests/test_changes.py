@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from conftest import create_tasks, register_user
+from routers import tasks
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def no_settle_window(monkeypatch):
+    # Без окна ожидания изменения видны сразу, а не через SYNC_SETTLE_SECONDS
+    monkeypatch.setattr(tasks, "SYNC_SETTLE_SECONDS", 0)
+
+
+async def sync_all(client, headers, limit: int, since=None):
+    changed, deleted = [], []
+    while True:
+        params = {"limit": limit, **({"since": since} if since else {})}
+        response = await client.get("/tasks/changes", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        changed.extend(item["id"] for item in body["changed"])
+        deleted.extend(item["id"] for item in body["deleted"])
+        since = body["next_token"]
+        if not body["has_more"]:
+            return changed, deleted, since
+
+
+async def test_changes_pages_cover_rows_updated_in_same_second(client):
+    headers = await register_user(client, "syncer")
+    created = await create_tasks(client, headers, 5)
+    await asyncio.sleep(0.01)
+
+    changed, deleted, _ = await sync_all(client, headers, limit=2)
+
+    assert changed == sorted(created)
+    assert deleted == []
+
+
+async def test_changes_pages_cover_tombstones_from_one_delete(client):
+    headers = await register_user(client, "deleter")
+    created = await create_tasks(client, headers, 5)
+    await asyncio.sleep(0.01)
+    _, _, since = await sync_all(client, headers, limit=2)
+
+    response = await client.request("DELETE", "/tasks/bulk", json={"ids": created[:3]}, headers=headers)
+    assert response.status_code == 200, response.text
+    await asyncio.sleep(0.01)
+
+    changed, deleted, _ = await sync_all(client, headers, limit=2, since=since)
+
+    assert changed == []
+    assert sorted(deleted) == created[:3]
@@ -0,0 +1,59 @@
+import json
+from datetime import timedelta
+
+import pytest
+
+import classification
+from classification import utc_now
+from conftest import register_user
+from routers import tasks
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def task_near_cutoff(client):
+    # Через 4 дня и 1 час: сейчас Q2, а через 2 часа уже срочная и Q1
+    headers = await register_user(client, "clocked")
+    started = utc_now()
+    deadline = started + timedelta(days=4, hours=1)
+    response = await client.post(
+        "/tasks/",
+        json={"title": "На границе", "is_important": True, "deadline_at": deadline.isoformat()},
+        headers=headers,
+    )
+    assert response.status_code == 201, response.text
+    assert response.json()["quadrant"] == "Q2"
+    return headers, started
+
+
+@pytest.fixture
+def advancing_clock(monkeypatch, task_near_cutoff):
+    # Первое обращение к часам — момент запроса, все следующие уже за порогом срочности
+    _, started = task_near_cutoff
+    readings = iter([started])
+
+    def clock():
+        return next(readings, started + timedelta(hours=2))
+
+    monkeypatch.setattr(tasks, "utc_now", clock)
+    monkeypatch.setattr(classification, "utc_now", clock)
+
+
+async def test_quadrant_page_classifies_with_filter_snapshot(client, task_near_cutoff, advancing_clock):
+    headers, _ = task_near_cutoff
+
+    response = await client.get("/tasks/quadrant/Q2", headers=headers)
+
+    assert response.status_code == 200, response.text
+    assert [item["quadrant"] for item in response.json()["items"]] == ["Q2"]
+
+
+async def test_export_classifies_with_filter_snapshot(client, task_near_cutoff, advancing_clock):
+    headers, _ = task_near_cutoff
+
+    response = await client.get("/tasks/export", params={"quadrant": "Q2"}, headers=headers)
+
+    assert response.status_code == 200, response.text
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["quadrant"] for item in items] == ["Q2"]
@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import select, text, tuple_
+
+from database import get_engine
+from models import Task
+
+pytestmark = pytest.mark.anyio
+
+
+async def query_plan(query) -> str:
+    compiled = query.compile(get_engine(), compile_kwargs={"literal_binds": True})
+    async with get_engine().connect() as conn:
+        rows = (await conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize("column, index", [
+    (Task.created_at, "ix_tasks_created_id"),
+    (Task.updated_at, "ix_tasks_updated_id"),
+])
+async def test_admin_keyset_reads_use_index(client, column, index):
+    # У администратора нет условия на user_id: страница — диапазон по (column, id) без сортировки
+    query = (
+        select(Task.id)
+        .where(tuple_(column, Task.id) > ("2026-01-01 00:00:00.000000", 0))
+        .order_by(column, Task.id)
+        .limit(51)
+    )
+
+    plan = await query_plan(query)
+
+    assert index in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,19 @@
+import pytest
+
+from conftest import register_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_request_metrics_use_route_template(client):
+    headers = await register_user(client, "measured")
+    response = await client.get("/tasks/12345", headers=headers)
+    assert response.status_code == 404
+    response = await client.get("/no-such-route")
+    assert response.status_code == 404
+
+    response = await client.get("http://test/metrics")
+
+    assert 'http_requests_total{method="GET",route="/api/v3/tasks/{task_id}",status="404"}' in response.text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in response.text
+    assert "/tasks/12345" not in response.text
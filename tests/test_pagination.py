@@ -0,0 +1,35 @@
+import pytest
+
+from conftest import create_tasks, register_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def collect_pages(client, headers, path: str, limit: int) -> list:
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(path, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        ids.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+async def test_keyset_pages_cover_rows_created_in_same_second(client):
+    headers = await register_user(client, "pager")
+    created = await create_tasks(client, headers, 5)
+
+    assert await collect_pages(client, headers, "/tasks", limit=2) == sorted(created)
+
+
+async def test_keyset_pages_with_projection(client):
+    headers = await register_user(client, "projector")
+    created = await create_tasks(client, headers, 5)
+
+    response = await client.get("/tasks", params={"limit": 2, "fields": "title"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert all(set(item) == {"title"} for item in response.json()["items"])
+    assert await collect_pages(client, headers, "/tasks/status/pending", limit=2) == sorted(created)
@@ -0,0 +1,88 @@
+import pytest
+
+import rate_limit
+from conftest import PASSWORD, register_user, statement_count
+from rate_limit import MemoryRateLimitBackend, RedisRateLimitBackend, parse_rate
+
+pytestmark = pytest.mark.anyio
+
+
+def make_backend(kind: str):
+    if kind == "memory":
+        return MemoryRateLimitBackend()
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisRateLimitBackend(client=fakeredis.FakeAsyncRedis())
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, monkeypatch):
+    backend = make_backend(request.param)
+    monkeypatch.setattr(rate_limit, "rate_limit_backend", backend)
+    return backend
+
+
+@pytest.mark.parametrize("rate", ["", "  ", "0", "0/minute"])
+def test_zero_or_empty_rate_disables_limit(rate):
+    assert parse_rate(rate) is None
+
+
+def test_parse_rate():
+    assert parse_rate("5/minute") == (5, 60.0)
+    assert parse_rate("10/hour") == (10, 3600.0)
+    with pytest.raises(ValueError):
+        parse_rate("5/fortnight")
+
+
+async def test_bucket_empties_and_reports_retry_after(backend):
+    assert await backend.take("bucket", 2, 60) == 0
+    assert await backend.take("bucket", 2, 60) == 0
+
+    retry_after = await backend.take("bucket", 2, 60)
+
+    # Ведро на 2 запроса в минуту пополняется на один токен за 30 секунд
+    assert 29 < retry_after <= 30
+    assert await backend.take("other-bucket", 2, 60) == 0
+
+
+async def test_redis_bucket_expires_after_period():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis()
+    backend = RedisRateLimitBackend(client=client)
+
+    await backend.take("bucket", 5, 10)
+
+    assert 0 < await client.pttl("bucket") <= 10_000
+
+
+async def test_login_limit_fires_before_bcrypt_and_sql(client, backend, monkeypatch):
+    await register_user(client, "limited")
+    monkeypatch.setattr(rate_limit.login_account_limit, "limit", (1, 60.0))
+    form = {"username": "limited@example.com", "password": PASSWORD}
+
+    response = await client.post("/auth/login", data=form)
+    assert response.status_code == 200, response.text
+
+    response = await client.post("/auth/login", data=form)
+
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["retry-after"]) <= 60
+    assert statement_count(response) == 0
+    assert "bcrypt;dur=0.00" in response.headers["server-timing"]
+
+
+async def test_api_limit_per_user(client, backend, monkeypatch):
+    headers = await register_user(client, "busy")
+    other = await register_user(client, "idle")
+    monkeypatch.setattr(rate_limit.api_user_limit, "limit", (2, 60.0))
+
+    for _ in range(2):
+        response = await client.get("/tasks", headers=headers)
+        assert response.status_code == 200, response.text
+
+    response = await client.get("/tasks", headers=headers)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    assert statement_count(response) == 0
+
+    response = await client.get("/tasks", headers=other)
+    assert response.status_code == 200, response.text
@@ -0,0 +1,53 @@
+import pytest
+
+import database
+from conftest import register_user
+from database import MemoryWriteMarks, ReadRouter, RedisWriteMarks
+
+pytestmark = pytest.mark.anyio
+
+REPLICA = object()
+
+
+@pytest.fixture(autouse=True)
+def fake_replica(monkeypatch):
+    monkeypatch.setattr(database, "get_replica_session_makers", lambda: [REPLICA])
+
+
+async def test_write_on_one_worker_sticks_reads_on_another():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    # Два воркера с общим Redis
+    writer = ReadRouter(1, RedisWriteMarks(5, client=fakeredis.FakeAsyncRedis(server=server)))
+    reader = ReadRouter(1, RedisWriteMarks(5, client=fakeredis.FakeAsyncRedis(server=server)))
+
+    assert await reader.session_maker_for(1) is REPLICA
+
+    await writer.mark_write(1)
+
+    assert await reader.session_maker_for(1) is database.get_session_maker()
+    assert await reader.session_maker_for(2) is REPLICA
+    assert reader.stats()["sticky_reads"] == 1
+
+
+async def test_memory_marks_are_per_process():
+    writer = ReadRouter(1, MemoryWriteMarks(5))
+    reader = ReadRouter(1, MemoryWriteMarks(5))
+
+    await writer.mark_write(1)
+
+    assert await writer.session_maker_for(1) is database.get_session_maker()
+    assert await reader.session_maker_for(1) is REPLICA
+
+
+async def test_routing_decisions_in_metrics(client):
+    headers = await register_user(client, "reader")
+    response = await client.get("/tasks", headers=headers)
+    assert response.status_code == 200, response.text
+
+    response = await client.get("http://test/metrics")
+
+    assert response.status_code == 200
+    assert "# TYPE db_read_routing_total counter" in response.text
+    samples = dict(line.rsplit(" ", 1) for line in response.text.splitlines() if line.startswith("db_read_routing"))
+    assert int(samples['db_read_routing_total{target="primary",reason="no_replicas"}']) > 0
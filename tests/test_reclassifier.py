@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+import anyio
+import pytest
+from sqlalchemy import select, update
+
+from conftest import create_tasks, register_user
+from classification import utc_now
+from database import get_session_maker
+from models import JobWatermark, Task
+from reclassifier import RECLASSIFY_JOB_NAME, reclassify_quadrants, run_reclassifier
+
+pytestmark = pytest.mark.anyio
+
+
+async def stored_quadrants() -> dict:
+    async with get_session_maker()() as session:
+        return dict((await session.execute(select(Task.id, Task.quadrant))).all())
+
+
+async def test_watermark_survives_restart_and_limits_next_pass(client):
+    headers = await register_user(client, "reclassified")
+    [task_id] = await create_tasks(client, headers, 1)
+    async with get_session_maker()() as session:
+        await session.execute(update(Task).values(quadrant="Q1"))
+        await session.commit()
+
+    now = utc_now()
+    # Первый запуск без watermark проходит по всей таблице
+    assert await reclassify_quadrants(now) == 1
+    assert (await stored_quadrants())[task_id] == "Q2"
+
+    async with get_session_maker()() as session:
+        job = await session.get(JobWatermark, RECLASSIFY_JOB_NAME)
+        assert job is not None
+
+    # Недавний проход другого процесса не повторяется
+    assert await reclassify_quadrants(now + timedelta(seconds=1), min_interval=30) is None
+
+    # Следующий проход трогает только окно дедлайнов после watermark, а не всю таблицу
+    async with get_session_maker()() as session:
+        await session.execute(update(Task).values(quadrant="Q1"))
+        await session.commit()
+    assert await reclassify_quadrants(now + timedelta(minutes=1)) == 0
+    assert (await stored_quadrants())[task_id] == "Q1"
+
+
+async def test_non_positive_interval_disables_reclassifier():
+    # Раньше interval=0 превращал цикл в asyncio.sleep(0) без конца
+    with anyio.fail_after(1):
+        await run_reclassifier(interval=0)
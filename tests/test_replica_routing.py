@@ -0,0 +1,83 @@
+import shutil
+
+import pytest
+from sqlalchemy import insert
+
+import database
+from conftest import create_tasks, register_user
+from database import MemoryWriteMarks, get_session_maker, read_router
+from models import Task
+from settings import settings
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def replica(client, tmp_path, monkeypatch):
+    # Вторая SQLite-база в роли реплики; копия основной появляется позже, в sync_replica
+    path = tmp_path / "replica.db"
+    monkeypatch.setattr(settings, "database_replica_urls", [f"sqlite+aiosqlite:///{path}"])
+    monkeypatch.setattr(database, "_replica_engines", None)
+    monkeypatch.setattr(database, "_replica_session_makers", None)
+    monkeypatch.setattr(read_router, "replica_count", 1)
+    monkeypatch.setattr(read_router, "replica_reads", [0])
+    monkeypatch.setattr(read_router, "write_marks", MemoryWriteMarks(60))
+    yield path
+    for engine in database.get_replica_engines():
+        await engine.dispose()
+
+
+def sync_replica(path) -> None:
+    # Снимок основной базы: всё, что запишется после, реплика "ещё не получила"
+    shutil.copyfile(settings.database_url.split("///", 1)[1], path)
+
+
+async def insert_task_on_primary(user_id: int, title: str) -> None:
+    # Мимо HTTP: такая запись не ставит метку read-your-writes
+    async with get_session_maker()() as session:
+        await session.execute(insert(Task).values(
+            title=title, is_important=False, quadrant="Q4", completed=False, user_id=user_id,
+        ))
+        await session.commit()
+
+
+async def task_titles(client, headers, **extra_headers) -> list:
+    response = await client.get("/tasks", headers={**headers, **extra_headers})
+    assert response.status_code == 200, response.text
+    return sorted(item["title"] for item in response.json()["items"])
+
+
+async def test_reads_go_to_replica(client, replica):
+    headers = await register_user(client, "reader")
+    await insert_task_on_primary(1, "Есть в реплике")
+    sync_replica(replica)
+    await insert_task_on_primary(1, "Только в основной")
+
+    assert await task_titles(client, headers) == ["Есть в реплике"]
+    assert read_router.replica_reads == [1]
+
+
+async def test_read_after_write_goes_to_primary(client, replica):
+    writer = await register_user(client, "writer")
+    other = await register_user(client, "other")
+    sync_replica(replica)
+
+    await create_tasks(client, writer, 1)
+    await insert_task_on_primary(2, "Только в основной")
+    sticky = read_router.sticky_reads
+
+    # Автор записи видит её сразу, остальные пользователи читают отстающую реплику
+    assert await task_titles(client, writer) == ["Задача 0"]
+    assert read_router.sticky_reads == sticky + 1
+    assert await task_titles(client, other) == []
+
+
+async def test_strong_consistency_header_goes_to_primary(client, replica):
+    headers = await register_user(client, "strict")
+    sync_replica(replica)
+    await insert_task_on_primary(1, "Только в основной")
+    strong = read_router.strong_reads
+
+    assert await task_titles(client, headers) == []
+    assert await task_titles(client, headers, **{"X-Read-Consistency": "strong"}) == ["Только в основной"]
+    assert read_router.strong_reads == strong + 1
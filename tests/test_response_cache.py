@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from cache import MemoryCacheBackend, RedisCacheBackend, ResponseCache, response_cache
+from conftest import create_tasks, register_user, statement_count
+
+pytestmark = pytest.mark.anyio
+
+
+def make_backend(kind: str):
+    if kind == "memory":
+        return MemoryCacheBackend(maxsize=100)
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisCacheBackend(client=fakeredis.FakeAsyncRedis())
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, monkeypatch):
+    backend = make_backend(request.param)
+    monkeypatch.setattr(response_cache, "backend", backend)
+    return backend
+
+
+async def test_stats_served_from_cache_until_task_write(client, backend):
+    headers = await register_user(client, "cached")
+    other = await register_user(client, "neighbour")
+    await create_tasks(client, headers, 2)
+
+    first = await client.get("/stats/", headers=headers)
+    second = await client.get("/stats/", headers=headers)
+
+    assert first.json()["total_tasks"] == second.json()["total_tasks"] == 2
+    # Повторный ответ из кэша: остаётся только запрос версии задач для ETag
+    assert statement_count(second) < statement_count(first)
+
+    # Запись другого пользователя не сбрасывает чужой кэш
+    await create_tasks(client, other, 1)
+    hits = response_cache.hits
+    response = await client.get("/stats/", headers=headers)
+    assert response.json()["total_tasks"] == 2
+    assert response_cache.hits == hits + 1
+
+    # Своя запись увеличивает поколение, и старая запись больше не читается
+    await create_tasks(client, headers, 1)
+    response = await client.get("/stats/", headers=headers)
+    assert response.json()["total_tasks"] == 3
+    assert response_cache.hits == hits + 1
+
+
+async def test_invalidation_bumps_owner_and_admin_generations(client, backend):
+    await response_cache.invalidate([1])
+    assert await backend.get_counter("gen:user:1") == 1
+    assert await backend.get_counter("gen:all") == 1
+    assert await backend.get_counter("gen:user:2") == 0
+
+
+@pytest.mark.parametrize("kind", ["memory", "redis"])
+async def test_concurrent_misses_share_one_computation(kind):
+    cache = ResponseCache(make_backend(kind), ttl=30)
+    calls = 0
+
+    async def compute() -> bytes:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b'{"value":1}'
+
+    results = await asyncio.gather(*(cache.get_or_compute("stats", "user:1", "", compute) for _ in range(5)))
+
+    assert results == [b'{"value":1}'] * 5
+    assert calls == 1
+    assert await cache.get_or_compute("stats", "user:1", "", compute) == b'{"value":1}'
+    assert calls == 1
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 4, 1)
+    assert stats["hit_ratio"] == round(5 / 6, 4)
+
+
+async def test_failed_computation_is_not_cached():
+    cache = ResponseCache(MemoryCacheBackend(maxsize=10), ttl=30)
+
+    async def failing() -> bytes:
+        raise RuntimeError("БД недоступна")
+
+    async def compute() -> bytes:
+        return b"{}"
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_compute("stats", "user:1", "", failing)
+    assert await cache.get_or_compute("stats", "user:1", "", compute) == b"{}"
+    assert cache.stats()["hits"] == 0
@@ -0,0 +1,82 @@
+import pytest
+
+from conftest import create_tasks, register_user, statement_count
+
+pytestmark = pytest.mark.anyio
+
+# Успешная запись: UPDATE/DELETE ... RETURNING и UPDATE версии задач владельца; удаление ещё пишет надгробие
+UPDATE_HIT_STATEMENTS = 2
+DELETE_HIT_STATEMENTS = 3
+# Промах: UPDATE/DELETE без строк и SELECT, отличающий 404 от 403
+MISS_STATEMENTS = 2
+
+
+@pytest.fixture
+async def owner_and_task(client):
+    owner = await register_user(client, "owner")
+    stranger = await register_user(client, "stranger")
+    [task_id] = await create_tasks(client, owner, 1)
+    return owner, stranger, task_id
+
+
+async def test_update_task_statements(client, owner_and_task):
+    owner, _, task_id = owner_and_task
+
+    response = await client.put(f"/tasks/{task_id}", json={"title": "Новое название"}, headers=owner)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["title"] == "Новое название"
+    assert statement_count(response) == UPDATE_HIT_STATEMENTS
+
+
+async def test_complete_task_statements(client, owner_and_task):
+    owner, _, task_id = owner_and_task
+
+    response = await client.patch(f"/tasks/{task_id}/complete", headers=owner)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["completed"] is True
+    assert statement_count(response) == UPDATE_HIT_STATEMENTS
+
+
+async def test_delete_task_statements(client, owner_and_task):
+    owner, _, task_id = owner_and_task
+
+    response = await client.delete(f"/tasks/{task_id}", headers=owner)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["id"] == task_id
+    assert statement_count(response) == DELETE_HIT_STATEMENTS
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("PUT", "/tasks/{task_id}", {"title": "Чужая задача"}),
+    ("PATCH", "/tasks/{task_id}/complete", None),
+    ("DELETE", "/tasks/{task_id}", None),
+])
+async def test_write_to_missing_task_statements(client, owner_and_task, method, path, body):
+    owner, _, task_id = owner_and_task
+
+    response = await client.request(method, path.format(task_id=task_id + 100), json=body, headers=owner)
+
+    assert response.status_code == 404, response.text
+    assert statement_count(response) == MISS_STATEMENTS
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("PUT", "/tasks/{task_id}", {"title": "Чужая задача"}),
+    ("PATCH", "/tasks/{task_id}/complete", None),
+    ("DELETE", "/tasks/{task_id}", None),
+])
+async def test_write_to_foreign_task_statements(client, owner_and_task, method, path, body):
+    owner, stranger, task_id = owner_and_task
+
+    response = await client.request(method, path.format(task_id=task_id), json=body, headers=stranger)
+
+    assert response.status_code == 403, response.text
+    assert statement_count(response) == MISS_STATEMENTS
+
+    # Промах ничего не изменил
+    response = await client.get(f"/tasks/{task_id}", headers=owner)
+    assert response.status_code == 200, response.text
+    assert response.json()["completed"] is False
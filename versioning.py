@@ -0,0 +1,104 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from dependencies import Principal, get_current_principal, get_read_session
+from models import User
+from settings import settings
+
+# Срочность и "дней до дедлайна" зависят от времени, поэтому ETag меняется хотя бы раз в интервал
+ETAG_TIME_BUCKET_SECONDS = settings.etag_time_bucket_seconds
+
+
+async def bump_tasks_version(db: AsyncSession, user_ids: Iterable[int]) -> None:
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    await db.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(tasks_version=User.tasks_version + 1, tasks_changed_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def get_tasks_version(db: AsyncSession, current_user: Principal) -> Tuple[str, Optional[datetime]]:
+    if current_user.role == "admin":
+        # Администратор видит задачи всех пользователей: версия — сумма версий и число пользователей
+        result = await db.execute(
+            select(
+                func.coalesce(func.sum(User.tasks_version), 0),
+                func.count(User.id),
+                func.max(User.tasks_changed_at),
+            )
+        )
+        total, users_count, changed_at = result.one()
+        return f"all:{total}:{users_count}", changed_at
+
+    result = await db.execute(
+        select(User.tasks_version, User.tasks_changed_at).where(User.id == current_user.id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        # Токен ещё действителен, но пользователь уже удалён
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Не удалось проверить учетные данные",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    version, changed_at = row
+    return f"user:{current_user.id}:{version}", changed_at
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    # Слабое сравнение: W/"x" и "x" считаются одинаковыми
+    opaque = etag.removeprefix("W/")
+    return "*" in candidates or any(value.removeprefix("W/") == opaque for value in candidates)
+
+
+def not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+async def conditional_get(
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_principal)
+) -> dict:
+    version, changed_at = await get_tasks_version(db, current_user)
+
+    now = time.time()
+    bucket_start = now - now % ETAG_TIME_BUCKET_SECONDS if ETAG_TIME_BUCKET_SECONDS > 0 else now
+    last_modified = datetime.fromtimestamp(bucket_start, tz=timezone.utc)
+    if changed_at is not None:
+        last_modified = max(last_modified, changed_at.astimezone(timezone.utc))
+
+    raw = f"{version}:{bucket_start}:{request.url.path}?{request.url.query}"
+    etag = f'W/"{hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        unchanged = etag_matches(if_none_match, etag)
+    else:
+        unchanged = if_modified_since is not None and not_modified_since(if_modified_since, last_modified)
+
+    if unchanged:
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return headers